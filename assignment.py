@@ -0,0 +1,184 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         assignment.py                                                    #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Match robots with pickups at the lowest total travel.            #
+#  Description:  Builds the robot-by-item distance matrix in one pass (with       #
+#                NumPy when it is installed, plain Python otherwise) and solves   #
+#                the matching with the Hungarian algorithm, so every robot in a   #
+#                batch gets the pickup that keeps the total number of steps       #
+#                smallest rather than the nearest one first. Also orders the      #
+#                stops of a multi-pick tour (nearest neighbour, then 2-opt).      #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure Python path gives the same result
+    np = None
+
+################################### CONSTANTS #####################################
+
+INFEASIBLE = 10 ** 9  # cost of a pair that must not be chosen
+
+############################## FUNCTION DEFINITIONS ###############################
+
+def trip_costs(robots, items, destination):
+    """
+    Compute the cost of every robot fetching every item and delivering it.
+
+    The cost is the Manhattan distance from the robot to the item plus the
+    distance from the item to the destination.
+
+    Args:
+        robots (list): Robots with a position attribute.
+        items (list): Items with a position attribute.
+        destination (tuple): The destination coordinates.
+
+    Returns:
+        list: A len(items) x len(robots) matrix (list of lists) of costs.
+    """
+    if not robots or not items:
+        return [[] for _ in items]
+    if np is not None:
+        robot_positions = np.array([robot.position for robot in robots])
+        item_positions = np.array([item.position for item in items])
+        to_robot = np.abs(item_positions[:, None, :] - robot_positions[None, :, :]).sum(axis=2)
+        to_destination = np.abs(item_positions - np.array(destination)).sum(axis=1)
+        return (to_robot + to_destination[:, None]).tolist()
+    dx, dy = destination
+    robot_positions = [robot.position for robot in robots]
+    costs = []
+    for item in items:
+        ix, iy = item.position
+        delivery = abs(ix - dx) + abs(iy - dy)
+        costs.append([abs(ix - rx) + abs(iy - ry) + delivery for rx, ry in robot_positions])
+    return costs
+
+def solve_assignment(cost):
+    """
+    Solve the rectangular assignment problem with the Hungarian algorithm.
+
+    Every row is matched with a different column so that the total cost is
+    minimal. There must be no more rows than columns.
+
+    Args:
+        cost (list): A matrix (list of lists) with n rows and m >= n columns.
+
+    Returns:
+        list: For each row, the index of the column it is matched with.
+    """
+    n = len(cost)
+    if n == 0:
+        return []
+    m = len(cost[0])
+    if n > m:
+        raise ValueError("The cost matrix needs at least as many columns as rows.")
+
+    # Potentials-based O(n^2 m) formulation; index 0 is a sentinel.
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    match = [0] * (m + 1)  # match[column] = row (1-based), 0 = unmatched
+    way = [0] * (m + 1)
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_value = [float('inf')] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[column] = True
+            current_row = match[column]
+            delta = float('inf')
+            next_column = 0
+            row_cost = cost[current_row - 1]
+            u_row = u[current_row]
+            for j in range(1, m + 1):
+                if not used[j]:
+                    reduced = row_cost[j - 1] - u_row - v[j]
+                    if reduced < min_value[j]:
+                        min_value[j] = reduced
+                        way[j] = column
+                    if min_value[j] < delta:
+                        delta = min_value[j]
+                        next_column = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_value[j] -= delta
+            column = next_column
+            if match[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+
+    assignment = [0] * n
+    for j in range(1, m + 1):
+        if match[j]:
+            assignment[match[j] - 1] = j - 1
+    return assignment
+
+def distance_matrix(points):
+    """
+    Compute the Manhattan distance between every pair of points.
+
+    Args:
+        points (list): (x, y) positions.
+
+    Returns:
+        list: A len(points) x len(points) matrix (list of lists) of distances.
+    """
+    if np is not None and points:
+        array = np.array(points)
+        return np.abs(array[:, None, :] - array[None, :, :]).sum(axis=2).tolist()
+    return [[abs(ax - bx) + abs(ay - by) for bx, by in points] for ax, ay in points]
+
+def tour_order(start, stops):
+    """
+    Choose the order in which to visit stops, starting from start.
+
+    A travelling-salesman heuristic over the precomputed distance matrix: the
+    tour is built by always going to the nearest unvisited stop, then improved
+    with 2-opt (reversing a stretch of the tour whenever that makes it
+    shorter) until no reversal helps. The tour ends at its last stop.
+
+    Args:
+        start (tuple): The position the tour starts from.
+        stops (list): The positions to visit.
+
+    Returns:
+        list: The indices of stops in visiting order.
+    """
+    if len(stops) < 2:
+        return list(range(len(stops)))
+    distance = distance_matrix([start] + list(stops))  # index 0 is the start
+
+    # Nearest neighbour
+    tour = [0]
+    unvisited = set(range(1, len(stops) + 1))
+    while unvisited:
+        row = distance[tour[-1]]
+        nearest = min(unvisited, key=lambda stop: (row[stop], stop))
+        tour.append(nearest)
+        unvisited.remove(nearest)
+
+    # 2-opt on the open path; the start stays first and the end is free.
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(tour) - 1):
+            for j in range(i + 1, len(tour)):
+                before, first, last = tour[i - 1], tour[i], tour[j]
+                change = distance[before][last] - distance[before][first]
+                if j + 1 < len(tour):
+                    after = tour[j + 1]
+                    change += distance[first][after] - distance[last][after]
+                if change < 0:
+                    tour[i:j + 1] = reversed(tour[i:j + 1])
+                    improved = True
+    return [stop - 1 for stop in tour[1:]]
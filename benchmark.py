@@ -0,0 +1,370 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         benchmark.py                                                     #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Measure the speed of the path planner and of whole warehouses.   #
+#  Description:  Runs the A* planner on a large empty grid, a large maze and an   #
+#                aisle layout (with and without the landmark heuristic, and with  #
+#                Jump Point Search on the open and aisle floors) and reports how  #
+#                many nodes are expanded per second, times the hierarchical       #
+#                (HPA*) planner on the maze before and after a cell is blocked,   #
+#                then compares replanning after every step with A* and with       #
+#                D* Lite. With --suite it instead builds the seeded scenarios of  #
+#                scenarios.py, runs each headless and reports planner throughput, #
+#                order completion and memory, optionally as a JSON file that a    #
+#                later run can be compared with. Usage:                           #
+#                    python benchmark.py [--size N] [--repeat R]                  #
+#                    python benchmark.py --suite quick [--output results.json]    #
+#                                        [--compare baseline.json]                #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+import argparse
+import contextlib
+import gc
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from path import PathPlanner, LandmarkHeuristic, OccupancyMap
+from metrics import METRICS
+from orders import DONE, PARTIAL, FAILED, CANCELLED
+from scenarios import Scenario, LAYOUTS
+from simulation import Simulation
+
+try:
+    import resource
+except ImportError:  # not available on Windows; the peak memory is left out there
+    resource = None
+
+################################### CONSTANTS #####################################
+
+# Suite -> floor sizes of its scenarios (every layout is run at every size)
+SUITES = {
+    'quick': (20, 100),
+    'standard': (20, 100, 500),
+    'full': (20, 100, 500, 2000),
+}
+
+# Results compared by --compare, with True where higher is better
+COMPARED = {
+    'planner_queries_per_second': True,
+    'planner_expansions_per_second': True,
+    'completion_rate': True,
+    'order_wait_p95': False,
+    'ticks_per_second': True,
+    'build_seconds': False,
+    'memory_bytes': False,
+}
+
+############################## FUNCTION DEFINITIONS ###############################
+
+def empty_grid(size):
+    # An obstacle-free floor, searched from one corner to the opposite one.
+    planner = PathPlanner(size, size)
+    return planner, (0, 0), (size - 1, size - 1)
+
+def maze_grid(size, seed=0):
+    # A perfect maze carved with a seeded depth-first search. Walls sit on the
+    # even rows/columns, so the size is rounded down to an odd number.
+    if size % 2 == 0:
+        size -= 1
+    rng = random.Random(seed)
+    walls = [[True] * size for _ in range(size)]
+    walls[1][1] = False
+    stack = [(1, 1)]
+    while stack:
+        x, y = stack[-1]
+        options = [(x + dx, y + dy, x + dx // 2, y + dy // 2)
+                   for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                   if 0 < x + dx < size - 1 and 0 < y + dy < size - 1 and walls[x + dx][y + dy]]
+        if not options:
+            stack.pop()
+            continue
+        nx, ny, wx, wy = rng.choice(options)
+        walls[wx][wy] = False
+        walls[nx][ny] = False
+        stack.append((nx, ny))
+
+    planner = PathPlanner(size, size)
+    for x in range(size):
+        for y in range(size):
+            if walls[x][y]:
+                planner.set_obstacle((x, y))
+    return planner, (1, 1), (size - 2, size - 2)
+
+def aisle_grid(size):
+    # Long racks separated by one-cell aisles, with cross aisles at both ends.
+    # The search runs from the middle of an aisle to a dock halfway along the
+    # top wall, straight across the racks, so the Manhattan distance badly
+    # underestimates the route.
+    planner = PathPlanner(size, size)
+    for x in range(2, size - 2, 3):
+        for y in range(3, size - 3):
+            planner.set_obstacle((x, y))
+    aisle = size // 2 + (1 if (size // 2 - 2) % 3 == 0 else 0)
+    return planner, (aisle, size // 2), (0, size // 2)
+
+def with_landmarks(planner, start, goal):
+    # Precompute the landmark heuristic for the planner's obstacles, with the
+    # goal (the dock) as one of the landmarks.
+    blocked = bytearray(0 if planner.is_free(index) else 1 for index in range(planner.length * planner.width))
+    began = time.perf_counter()
+    planner.landmarks = LandmarkHeuristic.build(planner.length, planner.width, blocked, anchors=(goal,))
+    print(f"{'landmarks':<12} built in {(time.perf_counter() - began) * 1000:.1f} ms")
+    return planner, start, goal
+
+def with_jump_points(planner, start, goal):
+    # Switch a test planner to Jump Point Search.
+    planner.algorithm = 'jps'
+    return planner, start, goal
+
+def run_case(name, planner, start, goal, repeat):
+    # Time repeated searches and report expansions per second.
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        path = planner.find_path(start, goal)
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    length = len(path) if path else 0
+    rate = planner.expansions / best if best else float('inf')
+    print(f"{name:<12} path length {length:>6}  expansions {planner.expansions:>8}  "
+          f"time {best * 1000:>9.1f} ms  {rate:>12,.0f} expansions/s")
+
+def hierarchical_case(name, planner, start, goal, repeat):
+    # Build the cluster graph, time repeated searches, then block one free cell
+    # off the route and time the search again, which only recomputes the
+    # touched cluster.
+    began = time.perf_counter()
+    hierarchy = planner.hierarchical()
+    hierarchy.refresh()
+    print(f"{'clusters':<12} built in {(time.perf_counter() - began) * 1000:.1f} ms")
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        path = hierarchy.find_path(start, goal)
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    length = len(path) if path else 0
+    print(f"{name:<12} path length {length:>6}  expansions {hierarchy.expansions:>8}  "
+          f"time {best * 1000:>9.1f} ms")
+    on_route = set(path)
+    middle = planner.length // 2
+    planner.set_obstacle(next((middle, y) for y in range(planner.width)
+                              if planner.is_valid((middle, y)) and (middle, y) not in on_route))
+    began = time.perf_counter()
+    path = hierarchy.find_path(start, goal)
+    elapsed = time.perf_counter() - began
+    length = len(path) if path else 0
+    print(f"{'  changed':<12} path length {length:>6}  expansions {hierarchy.expansions:>8}  "
+          f"time {elapsed * 1000:>9.1f} ms")
+
+def replanning_case(size, movers=20, steps=500, seed=0):
+    # Walk one robot through the maze, replanning after every step while other
+    # robots wander around at random, once with a fresh A* search per step and
+    # once with an incremental D* Lite search.
+    for mode in ('A*', 'D* Lite'):
+        rng = random.Random(seed)
+        planner, start, goal = maze_grid(size)
+        length = planner.length
+        planner.occupancy = OccupancyMap(length, length)
+        free_cells = [(x, y) for x in range(length) for y in range(length)
+                      if planner.is_valid((x, y)) and (x, y) not in (start, goal)]
+        others = rng.sample(free_cells, movers)
+        for position in others + [start]:
+            planner.occupancy.add(position)
+        search = planner.incremental(goal) if mode == 'D* Lite' else None
+        position, taken, expansions = start, 0, 0
+        began = time.perf_counter()
+        while position != goal and taken < steps:
+            path = search.find_path(position) if search else planner.find_path(position, goal)
+            expansions += (search or planner).expansions
+            if path:
+                planner.occupancy.move(position, path[1])
+                position = path[1]
+            taken += 1
+            for index, (x, y) in enumerate(others):
+                dx, dy = rng.choice(((0, 1), (0, -1), (1, 0), (-1, 0)))
+                step = (x + dx, y + dy)
+                if planner.is_valid(step) and step not in (position, goal):
+                    planner.occupancy.move((x, y), step)
+                    others[index] = step
+        elapsed = time.perf_counter() - began
+        if search:
+            search.close()
+        print(f"{'replan ' + mode:<12} steps {taken:>6}  expansions {expansions:>8}  "
+              f"time {elapsed * 1000:>9.1f} ms  {elapsed / max(taken, 1) * 1000:>8.3f} ms/step")
+
+def suite(name, seed=0):
+    # The scenarios of a suite: every layout at every size, with a fleet and an
+    # order stream growing with the floor
+    return [Scenario(layout, size, robots=min(max(4, size // 10), 100), orders=5 * min(max(4, size // 10), 100),
+                     seed=seed)
+            for size in SUITES[name] for layout in LAYOUTS]
+
+def run_scenario(scenario, queries=200, **options):
+    """
+    Build a scenario and measure it: the memory the warehouse takes, the
+    planner on seeded robot-to-slot queries (without the path cache), then a
+    headless simulation of the order stream.
+
+    Args:
+        scenario (Scenario): The scenario to run.
+        queries (int, optional): The number of planner queries. Defaults to 200.
+        **options: Passed on to Warehouse (e.g. path_algorithm='jps').
+
+    Returns:
+        dict: The results, one number per key.
+    """
+    gc.collect()
+    tracemalloc.start()
+    began = time.perf_counter()
+    warehouse = scenario.build(**options)
+    build = time.perf_counter() - began  # slowed down by the memory tracing
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    rng = scenario.random('queries')
+    planner = PathPlanner(warehouse.length, warehouse.width, warehouse.occupancy, algorithm=warehouse.path_algorithm)
+    pairs = [(rng.choice(warehouse.robots).position, rng.choice(warehouse.items).position) for _ in range(queries)]
+    expansions = found = 0
+    began = time.perf_counter()
+    for start, goal in pairs:
+        found += planner.find_path(start, goal, (goal,)) is not None
+        expansions += planner.expansions
+    planning = time.perf_counter() - began
+
+    METRICS.reset()
+    simulation = Simulation(warehouse)
+    simulation.spawn(scenario.feed(warehouse))
+    began = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):  # robots print every trip
+        simulated = simulation.run(until=scenario.duration)
+    wall = time.perf_counter() - began
+
+    submitted = METRICS.counter('orders_submitted_total')
+    closed = {status: METRICS.counter('orders_closed_total', status=status)
+              for status in (DONE, PARTIAL, FAILED, CANCELLED)}
+    wait = METRICS.histogram('order_wait_seconds') or {}
+    busy = METRICS.counter('robot_busy_seconds_total')
+    idle = METRICS.counter('robot_idle_seconds_total')
+    results = {
+        'items': len(warehouse.items),
+        'build_seconds': build,
+        'memory_bytes': memory,
+        'planner_queries': queries,
+        'planner_found': found,
+        'planner_queries_per_second': queries / planning if planning else 0,
+        'planner_expansions_per_second': expansions / planning if planning else 0,
+        'simulated_seconds': simulated,
+        'wall_seconds': wall,
+        'ticks_per_second': simulation.clock.tick / wall if wall else 0,
+        'orders_submitted': submitted,
+        'orders_done': closed[DONE],
+        'orders_partial': closed[PARTIAL],
+        'orders_failed': closed[FAILED],
+        'orders_open': submitted - sum(closed.values()),
+        'completion_rate': closed[DONE] / submitted if submitted else 0,
+        'order_wait_p50': wait.get('p50', 0),
+        'order_wait_p95': wait.get('p95', 0),
+        'robot_utilisation': busy / (busy + idle) if busy + idle else 0,
+        'simulation_planner_calls': METRICS.counter('planner_calls_total', algorithm=warehouse.path_algorithm),
+    }
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        results['process_peak_bytes'] = peak if platform.system() == 'Darwin' else peak * 1024
+    return results
+
+def commit_id():
+    # The current git commit of this code, or None outside a git checkout
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def run_suite(name, seed=0, queries=200, **options):
+    """
+    Run every scenario of a suite, printing one line per scenario.
+
+    Args:
+        name (str): A key of SUITES.
+        seed (int, optional): The seed of the scenarios. Defaults to 0.
+        queries (int, optional): Planner queries per scenario. Defaults to 200.
+        **options: Passed on to Warehouse.
+
+    Returns:
+        dict: The report, ready to be written as JSON: the suite, the commit,
+            the environment and {scenario name: {'scenario': ..., 'results': ...}}.
+    """
+    report = {'suite': name, 'seed': seed, 'commit': commit_id(), 'python': platform.python_version(),
+              'numpy': importlib.util.find_spec('numpy') is not None, 'options': options, 'scenarios': {}}
+    for scenario in suite(name, seed):
+        results = run_scenario(scenario, queries, **options)
+        report['scenarios'][scenario.name] = {'scenario': scenario.describe(), 'results': results}
+        print(f"{scenario.name:<22} {results['planner_queries_per_second']:>9,.0f} queries/s  "
+              f"{results['planner_expansions_per_second']:>11,.0f} expansions/s  "
+              f"orders {results['orders_done']:>4}/{results['orders_submitted']:<4} done  "
+              f"wait p95 {results['order_wait_p95']:>6g} s  "
+              f"{results['ticks_per_second']:>8,.0f} ticks/s  {results['memory_bytes'] / 2 ** 20:>8.1f} MiB")
+    return report
+
+def compare(baseline, report):
+    # Print the change of the COMPARED results between two reports
+    print(f"change since {baseline.get('commit') or 'the baseline'} (positive is better):")
+    for name, entry in report['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+        changes = []
+        for key, higher_is_better in COMPARED.items():
+            before, after = old['results'].get(key), entry['results'].get(key)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            changes.append(f"{key} {change if higher_is_better else -change:+.1f}%")
+        print(f"{name:<22} " + '  '.join(changes))
+
+############################## MAIN PROGRAM EXECUTION #############################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the path planner, or whole warehouses with --suite.')
+    parser.add_argument('--size', type=int, default=500, help='side length of the test grids')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs per case (best is kept)')
+    parser.add_argument('--suite', choices=sorted(SUITES), help='run the scenario suite instead of the planner cases')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the suite scenarios')
+    parser.add_argument('--queries', type=int, default=200, help='planner queries per suite scenario')
+    parser.add_argument('--algorithm', default='astar', choices=sorted(PathPlanner.ALGORITHMS),
+                        help='path planning algorithm of the suite warehouses')
+    parser.add_argument('--path-cache', type=int, default=0,
+                        help='routes kept in the path cache of the suite warehouses (0: no cache)')
+    parser.add_argument('--output', help='write the suite results to this JSON file')
+    parser.add_argument('--compare', help='compare the suite results with an earlier JSON file')
+    args = parser.parse_args()
+
+    if args.suite:
+        report = run_suite(args.suite, args.seed, args.queries, path_algorithm=args.algorithm,
+                           path_cache_size=args.path_cache)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(report, file, indent=1)
+        if args.compare:
+            with open(args.compare) as file:
+                compare(json.load(file), report)
+    else:
+        run_case('empty', *empty_grid(args.size), args.repeat)
+        run_case('empty JPS', *with_jump_points(*empty_grid(args.size)), args.repeat)
+        run_case('maze', *maze_grid(args.size), args.repeat)
+        run_case('aisles', *aisle_grid(args.size), args.repeat)
+        run_case('aisles JPS', *with_jump_points(*aisle_grid(args.size)), args.repeat)
+        run_case('aisles+ALT', *with_landmarks(*aisle_grid(args.size)), args.repeat)
+        hierarchical_case('maze HPA*', *maze_grid(args.size), args.repeat)
+        replanning_case(args.size)
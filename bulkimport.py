@@ -0,0 +1,189 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         bulkimport.py                                                    #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Load many items and robots into a warehouse at once.             #
+#  Description:  Rows come from a CSV file or any iterable (Item and Robot        #
+#                objects or dicts). All rows are checked in one pass against      #
+#                hash maps of the occupied positions and of the unit weight of    #
+#                every item name, and every conflict is reported together in a    #
+#                BulkImportError instead of one GUI message per row. The rows     #
+#                that pass are then stored in bulk. Used by                       #
+#                Warehouse.import_items and Warehouse.import_robots.              #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+import csv
+from itemrobot import Item, Robot, ROBOT_CLASSES
+
+################################### CONSTANTS #####################################
+
+ITEM_COLUMNS = ('item_name', 'item_id', 'x', 'y', 'unit_weight', 'quantity')
+ROBOT_COLUMNS = ('robot_type', 'robot_id', 'x', 'y')
+
+############################### CLASS DEFINITIONS #################################
+
+#===============================================================
+#  Class:       BulkImportError
+#  Attributes:
+#               conflicts : One message per rejected row, e.g.
+#                           "row 12: position (3, 4) is occupied by bolt"
+#                           (rows are counted from 1, not counting a CSV header)
+#
+class BulkImportError(ValueError):
+    def __init__(self, conflicts):
+        shown = '\n'.join(conflicts[:20])
+        more = f"\n... and {len(conflicts) - 20} more" if len(conflicts) > 20 else ''
+        super().__init__(f"{len(conflicts)} conflicting rows:\n{shown}{more}")
+        self.conflicts = conflicts
+
+############################## FUNCTION DEFINITIONS ###############################
+
+def read_csv(filename):
+    """
+    Read the rows of a CSV file with a header line.
+
+    Items need the columns item_name, x, y, unit_weight and quantity (item_id
+    is optional); robots need robot_type, x and y (robot_id is optional).
+
+    Args:
+        filename (str): The CSV file.
+
+    Returns:
+        generator: One dict per row.
+    """
+    with open(filename, newline='', encoding='utf-8') as file:
+        yield from csv.DictReader(file)
+
+def blank(value):
+    # Whether an optional CSV field was left empty
+    return value is None or value == ''
+
+def plan_items(warehouse, rows):
+    """
+    Check item rows against the warehouse and each other.
+
+    A row at a position already holding the same item (same name and unit
+    weight) tops that slot up, as add_item does. A row is rejected if its
+    position is out of bounds or holds another item, if its unit weight
+    differs from the one already used for its name, or if a value is missing
+    or malformed. Missing item IDs are filled in as the GUI does: the ID of the
+    item's existing slots, or the next free number.
+
+    Args:
+        warehouse (Warehouse): The warehouse to import into.
+        rows (iterable): Item objects or dicts with the ITEM_COLUMNS.
+
+    Returns:
+        tuple: (new_items, top_ups, conflicts) where top_ups is a list of
+            (existing_item, quantity) and conflicts a list of messages.
+    """
+    new_items = {}     # position -> Item created by this import
+    top_ups = {}       # position -> quantity added to an existing slot
+    unit_weights = {}  # item name -> unit weight used by this import
+    item_ids = {}      # item name -> item ID used by this import
+    next_id = len(warehouse.stock) + 1
+    conflicts = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            if isinstance(row, Item):
+                item_name, item_id, (x, y) = row.item_name, row.item_id, row.position
+                unit_weight, quantity = row.unit_weight, row.quantity
+            else:
+                item_name = (row.get('item_name') or '').strip()
+                item_id = None if blank(row.get('item_id')) else int(row['item_id'])
+                x, y = int(row['x']), int(row['y'])
+                unit_weight, quantity = float(row['unit_weight']), int(row['quantity'])
+        except (KeyError, TypeError, ValueError) as error:
+            conflicts.append(f"row {number}: missing or malformed value ({error})")
+            continue
+        position = (x, y)
+        if not item_name:
+            conflicts.append(f"row {number}: item name is empty")
+            continue
+        if not warehouse.occupancy.in_bounds(position):
+            conflicts.append(f"row {number}: position {position} is out of bounds")
+            continue
+        if quantity <= 0:
+            conflicts.append(f"row {number}: quantity must be positive")
+            continue
+
+        record = warehouse.stock.get(item_name)
+        expected = unit_weights.get(item_name, record.unit_weight if record is not None else None)
+        if expected is not None and unit_weight != expected:
+            conflicts.append(f"row {number}: unit weight {unit_weight} of {item_name} differs from {expected}")
+            continue
+        occupant = new_items.get(position) or warehouse.item_index.get(position)
+        if occupant is not None and occupant.item_name != item_name:
+            conflicts.append(f"row {number}: position {position} is occupied by {occupant.item_name}")
+            continue
+        unit_weights[item_name] = unit_weight
+
+        if occupant is not None:
+            if position in new_items:
+                occupant.add_quantity(quantity)
+                occupant.add_weight(unit_weight * quantity)
+            else:
+                top_ups[position] = top_ups.get(position, 0) + quantity
+            continue
+        if item_id is None:
+            item_id = item_ids.get(item_name)
+            if item_id is None:
+                if record is not None:
+                    item_id = record.item_id
+                else:
+                    item_id = next_id
+                    next_id += 1
+        item_ids.setdefault(item_name, item_id)
+        new_items[position] = Item(item_name, item_id, position, unit_weight, quantity)
+    top_ups = [(warehouse.item_index[position], quantity) for position, quantity in top_ups.items()]
+    return list(new_items.values()), top_ups, conflicts
+
+def plan_robots(warehouse, rows):
+    """
+    Check robot rows against the warehouse and each other.
+
+    A row is rejected if its position is out of bounds or already holds a
+    robot, if its type is unknown, or if a value is missing or malformed.
+    Missing robot IDs are numbered per type, as the GUI does.
+
+    Args:
+        warehouse (Warehouse): The warehouse to import into.
+        rows (iterable): Robot objects or dicts with the ROBOT_COLUMNS
+            (robot_type is 'standard', 'large' or 'mini').
+
+    Returns:
+        tuple: (robots, conflicts).
+    """
+    robots = {}  # position -> Robot created by this import
+    counts = {'standard': len(warehouse.standard_robots), 'large': len(warehouse.large_robots),
+              'mini': len(warehouse.mini_robots)}
+    conflicts = []
+    for number, row in enumerate(rows, start=1):
+        if isinstance(row, Robot):
+            robot = row
+        else:
+            try:
+                robot_type = (row.get('robot_type') or 'standard').strip()
+                robot_id = None if blank(row.get('robot_id')) else int(row['robot_id'])
+                position = (int(row['x']), int(row['y']))
+            except (KeyError, TypeError, ValueError) as error:
+                conflicts.append(f"row {number}: missing or malformed value ({error})")
+                continue
+            if robot_type not in ROBOT_CLASSES:
+                conflicts.append(f"row {number}: unknown robot type {robot_type!r}")
+                continue
+            if robot_id is None:
+                robot_id = counts[robot_type] + 1
+            robot = ROBOT_CLASSES[robot_type](robot_id, position)
+        if not warehouse.occupancy.in_bounds(robot.position):
+            conflicts.append(f"row {number}: position {robot.position} is out of bounds")
+            continue
+        if robot.position in robots or robot.position in warehouse.robot_index:
+            conflicts.append(f"row {number}: position {robot.position} already holds a robot")
+            continue
+        counts[robot.robot_type] = counts.get(robot.robot_type, 0) + 1
+        robots[robot.position] = robot
+    return list(robots.values()), conflicts
@@ -0,0 +1,299 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         eventlog.py                                                      #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Keep the warehouse state on disk so it survives a crash.         #
+#  Description:  The EventLog appends one compact JSON line per change to the     #
+#                warehouse (item slots added and changed, robots placed and       #
+#                stepped, destinations, orders, task assignments, pickups and     #
+#                deliveries) and writes a snapshot of the whole state every so    #
+#                many events. restore() rebuilds a Warehouse from the latest      #
+#                snapshot plus the events logged after it, so replay time does    #
+#                not grow with the length of the log.                             #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+import json
+import os
+from warehouse import Warehouse
+from itemrobot import Item, ROBOT_CLASSES
+from orders import Order, QUEUED, ACTIVE
+
+################################### CONSTANTS #####################################
+
+LOG_FILE = 'events.log'
+SNAPSHOT_FILE = 'snapshot.json'
+
+############################### CLASS DEFINITIONS #################################
+
+#===============================================================
+#  Class:       EventLog
+#  Attributes:
+#               directory      : The directory holding the log and the snapshot
+#               snapshot_every : The number of events between two snapshots
+#               flush_every    : The number of events buffered before they are
+#                                written out and synced to disk
+#               file           : The log file, opened for appending
+#               warehouse      : The warehouse being recorded, or None
+#               since_snapshot : The events appended since the last snapshot
+#               unflushed      : The events appended since the last flush
+#
+#  Events are JSON arrays whose first element names the event:
+#    ['item', name, item_id, x, y, unit_weight, quantity]  a new slot
+#    ['quantity', x, y, quantity]                          a slot's new quantity
+#    ['robot', robot_type, robot_id, x, y]                 a robot placed
+#    ['step', robot_type, robot_id, x, y]                  a robot moved
+#    ['destination', x, y] / ['destination_used', x, y]
+#    ['resize', length, width]
+#    ['order', order_id, item_name, quantity, x, y, priority]
+#    ['order_state', order_id, status, delivered, failures]
+#    ['assign', robot_type, robot_id, x, y, quantity]      a pickup planned
+#    ['pickup', robot_type, robot_id, x, y, quantity, load]
+#    ['deliver', robot_type, robot_id, x, y, quantity, load]
+#
+#  Robot IDs are only unique per robot type (the GUI numbers each type from
+#  1), so robots are identified by (robot_type, robot_id).
+#
+#  Durability: events reach the disk (os.fsync) when they are flushed, which
+#  happens every flush_every events, at every snapshot and on close(). A
+#  crash of the process, the OS or the power loses at most the last
+#  flush_every - 1 events; flush_every=1 syncs every event, at the cost of
+#  one fsync each. A line torn by the crash is ignored by restore().
+#
+class EventLog:
+    def __init__(self, directory, snapshot_every=50000, flush_every=256):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.flush_every = flush_every
+        self.file = open(os.path.join(directory, LOG_FILE), 'ab')
+        self.warehouse = None
+        self.since_snapshot = 0
+        self.unflushed = 0
+
+    def attach(self, warehouse):
+        """
+        Start recording a warehouse, beginning with a snapshot of its current state.
+
+        Args:
+            warehouse (Warehouse): The warehouse to record.
+
+        Returns:
+            None
+        """
+        self.warehouse = warehouse
+        warehouse.event_log = self
+        self.snapshot()
+
+    def close(self):
+        """Stop recording, sync the remaining events and close the log file."""
+        if self.warehouse is not None and self.warehouse.event_log is self:
+            self.warehouse.event_log = None
+        self.warehouse = None
+        self.flush()
+        self.file.close()
+
+    def append(self, event):
+        """
+        Append one event, taking a snapshot once snapshot_every events have
+        been logged since the last one.
+
+        Args:
+            event (tuple): The event (see the class comment).
+
+        Returns:
+            None
+        """
+        self.file.write(json.dumps(event, separators=(',', ':')).encode() + b'\n')
+        self.since_snapshot += 1
+        self.unflushed += 1
+        if self.since_snapshot >= self.snapshot_every and self.warehouse is not None:
+            self.snapshot()
+        elif self.unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        # Write buffered events out to the file and make sure they are on disk
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unflushed = 0
+
+    def snapshot(self):
+        """
+        Write the whole state of the warehouse, with the log offset it
+        corresponds to. The file is synced and then replaced atomically, so a
+        crash while writing leaves the previous snapshot in place.
+
+        Returns:
+            None
+        """
+        self.flush()
+        state = capture(self.warehouse)
+        state['offset'] = self.file.tell()
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(state, file, separators=(',', ':'))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + '.tmp', path)
+        sync_directory(self.directory)
+        self.since_snapshot = 0
+
+    @staticmethod
+    def restore(directory, **options):
+        """
+        Rebuild a warehouse from the latest snapshot and the events after it.
+
+        Robots come back idle, and orders that were being worked on come back
+        open with what they had delivered; the pickups that were under way are
+        handed out again once a simulation runs the dispatcher. A line cut
+        short by a crash at the end of the log is ignored.
+
+        Args:
+            directory (str): The directory written by an EventLog.
+            **options: Passed on to the Warehouse constructor (e.g. gui).
+
+        Returns:
+            Warehouse: The restored warehouse (not being recorded).
+        """
+        with open(os.path.join(directory, SNAPSHOT_FILE)) as file:
+            state = json.load(file)
+        warehouse = Warehouse(state['length'], state['width'], **options)
+        load_state(warehouse, state)
+        robots = {(robot.robot_type, robot.robot_id): robot for robot in warehouse.robots}
+        with open(os.path.join(directory, LOG_FILE), 'rb') as file:
+            file.seek(state['offset'])
+            for line in file:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # torn final write
+                apply_event(warehouse, robots, event)
+        for order in warehouse.orders.orders.values():
+            order.in_flight = 0
+            order.stopping = not order.is_open
+            if order.is_open:
+                order.status = ACTIVE if order.delivered else QUEUED
+        return warehouse
+
+############################## FUNCTION DEFINITIONS ###############################
+
+def sync_directory(directory):
+    # Make a file replaced in the directory survive a power loss (POSIX only;
+    # Windows cannot open a directory and commits the rename itself)
+    if os.name != 'posix':
+        return
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+def make_robot(robot_type, robot_id, position):
+    # Create a logged robot; an unknown type means the log does not belong to this version
+    if robot_type not in ROBOT_CLASSES:
+        raise ValueError(f"Unknown robot type in the event log: {robot_type!r}.")
+    return ROBOT_CLASSES[robot_type](robot_id, position)
+
+def capture(warehouse):
+    """
+    Describe the state of a warehouse as plain lists, for a snapshot.
+
+    Args:
+        warehouse (Warehouse): The warehouse.
+
+    Returns:
+        dict: The dimensions, item slots, robots, destinations and orders.
+    """
+    return {
+        'length': warehouse.length,
+        'width': warehouse.width,
+        'items': [[item.item_name, item.item_id, *item.position, item.unit_weight, item.quantity]
+                  for item in warehouse.items],
+        'robots': [[robot.robot_id, robot.robot_type, *robot.position, robot.current_load]
+                   for robot in warehouse.robots],
+        'destinations': [list(destination) for destination in warehouse.destination],
+        'orders': [[order.order_id, order.item_name, order.quantity, *order.destination, order.priority,
+                    order.status, order.delivered, order.failures]
+                   for order in warehouse.orders.orders.values()],
+    }
+
+def load_state(warehouse, state):
+    """
+    Fill an empty warehouse from a snapshot made by capture().
+
+    Items are stored directly, without add_item's checks and messages; the
+    snapshot was taken from a consistent warehouse.
+
+    Args:
+        warehouse (Warehouse): A new warehouse of the snapshot's size.
+        state (dict): The snapshot.
+
+    Returns:
+        None
+    """
+    for item_name, item_id, x, y, unit_weight, quantity in state['items']:
+        warehouse.store_item(Item(item_name, item_id, (x, y), unit_weight, quantity))
+    for robot_id, robot_type, x, y, load in state['robots']:
+        robot = make_robot(robot_type, robot_id, (x, y))
+        robot.current_load = load
+        warehouse.add_robot(robot)
+    warehouse.destination = [tuple(destination) for destination in state['destinations']]
+    for order_id, item_name, quantity, x, y, priority, status, delivered, failures in state['orders']:
+        order = Order(order_id, item_name, quantity, (x, y), priority)
+        order.status, order.delivered, order.failures = status, delivered, failures
+        warehouse.orders.restore(order)
+
+def apply_event(warehouse, robots, event):
+    """
+    Replay one logged event on a warehouse.
+
+    Args:
+        warehouse (Warehouse): The warehouse being rebuilt.
+        robots (dict): (robot_type, robot_id) -> robot, kept up to date for
+            'robot' events.
+        event (list): The event (see EventLog).
+
+    Returns:
+        None
+    """
+    kind = event[0]
+    if kind == 'step':
+        warehouse.move_robot(robots[event[1], event[2]], (event[3], event[4]))
+    elif kind == 'quantity':
+        item = warehouse.item_at((event[1], event[2]))
+        change = event[3] - item.quantity
+        if change < 0:
+            warehouse.take_item(item, -change)
+        elif change > 0:
+            warehouse.top_up_item(item, Item(item.item_name, item.item_id, item.position, item.unit_weight, change))
+    elif kind == 'item':
+        _, item_name, item_id, x, y, unit_weight, quantity = event
+        warehouse.store_item(Item(item_name, item_id, (x, y), unit_weight, quantity))
+    elif kind in ('pickup', 'deliver'):
+        robots[event[1], event[2]].current_load = event[6]
+    elif kind == 'robot':
+        _, robot_type, robot_id, x, y = event
+        robot = make_robot(robot_type, robot_id, (x, y))
+        warehouse.add_robot(robot)
+        robots[robot_type, robot_id] = robot
+    elif kind == 'destination':
+        warehouse.destination.append((event[1], event[2]))
+    elif kind == 'destination_used':
+        warehouse.destination.remove((event[1], event[2]))
+    elif kind == 'resize':
+        warehouse.resize(event[1], event[2])
+    elif kind == 'order':
+        _, order_id, item_name, quantity, x, y, priority = event
+        warehouse.orders.restore(Order(order_id, item_name, quantity, (x, y), priority))
+    elif kind == 'order_state':
+        _, order_id, status, delivered, failures = event
+        order = warehouse.orders.get(order_id)
+        if order is not None:
+            was_open = order.is_open
+            order.status, order.delivered, order.failures = status, delivered, failures
+            if was_open and not order.is_open:
+                warehouse.orders.retire(order)
+    # 'assign' events are kept for the record; they change no state.
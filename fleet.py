@@ -0,0 +1,213 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         fleet.py                                                         #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Keep the state of the whole robot fleet in columns.              #
+#  Description:  The FleetStore holds the position, load, capacity, speed and     #
+#                state of every robot as one array per attribute (NumPy arrays    #
+#                when NumPy is installed, array.array otherwise). Robots added    #
+#                to the store become views onto their row, so the rest of the     #
+#                code keeps using robot.position and friends, while distance,     #
+#                capacity and availability checks over the whole fleet run as     #
+#                single array operations instead of one Python call per robot.    #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+from array import array
+from assignment import INFEASIBLE
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure Python path gives the same result
+    np = None
+
+################################### CONSTANTS #####################################
+
+# attribute -> array typecode of its column (position is split into x and y)
+COLUMNS = {'x': 'q', 'y': 'q', 'load': 'd', 'capacity': 'd', 'speed': 'd', 'state': 'b'}
+DTYPES = {'q': 'int64', 'd': 'float64', 'b': 'bool'}
+
+############################### CLASS DEFINITIONS #################################
+
+#===============================================================
+#  Class:       FleetStore
+#  Attributes:
+#               robots                          : The robots in the store, by slot
+#               x, y                            : Per slot, the robot's position
+#               load, capacity, speed, state    : Per slot, the robot's current_load,
+#                                                 capacity, speed and state
+#               order                           : The slots in the order the owner
+#                                                 lists its robots (see set_order)
+#
+#  Only the first len(robots) entries of each column are in use; the NumPy
+#  columns grow by doubling.
+#
+class FleetStore:
+    def __init__(self, robots=()):
+        self.robots = []
+        self.order = []
+        for name, typecode in COLUMNS.items():
+            setattr(self, name, np.zeros(16, DTYPES[typecode]) if np is not None else array(typecode))
+        for robot in robots:
+            self.add(robot)
+
+    def __len__(self):
+        # The number of robots in the store
+        return len(self.robots)
+
+    def add(self, robot):
+        """
+        Move a robot's state into the store and turn the robot into a view onto it.
+
+        Args:
+            robot (Robot): A robot not yet in a store.
+
+        Returns:
+            int: The robot's slot.
+        """
+        slot = len(self.robots)
+        row = {'x': robot.position[0], 'y': robot.position[1], 'load': robot.current_load,
+               'capacity': robot.capacity, 'speed': robot.speed, 'state': robot.state}
+        if np is not None and slot == len(self.x):
+            for name in COLUMNS:
+                column = getattr(self, name)
+                setattr(self, name, np.concatenate((column, np.zeros_like(column))))
+        for name, value in row.items():
+            if np is not None:
+                getattr(self, name)[slot] = value
+            else:
+                getattr(self, name).append(value)
+        robot.__class__ = view_class(type(robot))
+        robot.fleet = self
+        robot.slot = slot
+        self.robots.append(robot)
+        self.order.append(slot)
+        return slot
+
+    def set_order(self, robots):
+        """
+        Set the order in which idle_slots lists the robots, e.g. the order of
+        Warehouse.robots, so that ties between robots break the same way as
+        without the store.
+
+        Args:
+            robots (list): Every robot of the store, in the wanted order.
+
+        Returns:
+            None
+        """
+        self.order = [robot.slot for robot in robots]
+
+    def idle_slots(self):
+        """
+        List the slots of the robots that can take a task (state True).
+
+        Returns:
+            list: The slots, in the order set by set_order (by default the
+                order the robots were added).
+        """
+        order = self.order
+        if np is not None:
+            order = np.asarray(order, dtype=np.int64)
+            return order[self.state[order]].tolist()
+        state = self.state
+        return [slot for slot in order if state[slot]]
+
+    def idle_count(self):
+        # The number of robots that can take a task
+        if np is not None:
+            return int(np.count_nonzero(self.state[:len(self.robots)]))
+        return sum(self.state)
+
+    def pickup_costs(self, slots, items, destination, quantity):
+        """
+        Compute the cost of every robot fetching every item and delivering it,
+        as assignment.trip_costs does, with INFEASIBLE wherever the robot cannot
+        carry min(quantity, item.quantity) of the item.
+
+        Args:
+            slots (list): The slots of the robots.
+            items (list): The candidate items.
+            destination (tuple): The destination coordinates.
+            quantity (int): The quantity still to move.
+
+        Returns:
+            list: A len(items) x len(slots) matrix (list of lists) of costs.
+        """
+        if not slots or not items:
+            return [[] for _ in items]
+        dx, dy = destination
+        weights = [item.unit_weight * min(quantity, item.quantity) for item in items]
+        if np is not None:
+            slots = np.asarray(slots, dtype=np.int64)
+            item_x = np.array([item.position[0] for item in items])
+            item_y = np.array([item.position[1] for item in items])
+            costs = (np.abs(item_x[:, None] - self.x[slots][None, :])
+                     + np.abs(item_y[:, None] - self.y[slots][None, :])
+                     + (np.abs(item_x - dx) + np.abs(item_y - dy))[:, None])
+            fits = np.array(weights)[:, None] + self.load[slots][None, :] <= self.capacity[slots][None, :]
+            return np.where(fits, costs, INFEASIBLE).tolist()
+        x, y, load, capacity = self.x, self.y, self.load, self.capacity
+        costs = []
+        for item, weight in zip(items, weights):
+            ix, iy = item.position
+            delivery = abs(ix - dx) + abs(iy - dy)
+            costs.append([abs(ix - x[slot]) + abs(iy - y[slot]) + delivery
+                          if weight + load[slot] <= capacity[slot] else INFEASIBLE
+                          for slot in slots])
+        return costs
+
+############################## FUNCTION DEFINITIONS ###############################
+
+def column_property(name, convert):
+    # A property reading and writing one column of the robot's store
+    def get(robot):
+        return convert(getattr(robot.fleet, name)[robot.slot])
+
+    def set(robot, value):
+        getattr(robot.fleet, name)[robot.slot] = value
+    return property(get, set)
+
+def get_position(robot):
+    # The robot's position, read from the x and y columns
+    fleet, slot = robot.fleet, robot.slot
+    return (int(fleet.x[slot]), int(fleet.y[slot]))
+
+def set_position(robot, position):
+    # Write the robot's position to the x and y columns
+    fleet, slot = robot.fleet, robot.slot
+    fleet.x[slot], fleet.y[slot] = position
+
+VIEW_CLASSES = {}  # robot class -> its view class
+
+def view_class(robot_class):
+    """
+    Get the view subclass of a robot class, whose position, current_load,
+    capacity, speed and state live in the robot's FleetStore.
+
+    The view adds no slots, so a robot can switch to it by assigning
+    __class__; isinstance checks and methods are unchanged.
+
+    Args:
+        robot_class (type): Robot or one of its subclasses.
+
+    Returns:
+        type: The view class.
+    """
+    if robot_class in VIEW_CLASSES.values():
+        return robot_class
+    view = VIEW_CLASSES.get(robot_class)
+    if view is None:
+        view = type(robot_class.__name__, (robot_class,), {
+            '__slots__': (),
+            '__module__': robot_class.__module__,
+            'position': property(get_position, set_position),
+            'current_load': column_property('load', float),
+            'capacity': column_property('capacity', float),
+            'speed': column_property('speed', float),
+            'state': column_property('state', bool),
+        })
+        VIEW_CLASSES[robot_class] = view
+    return view
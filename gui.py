@@ -13,9 +13,15 @@
 
 #################################### IMPORTS ######################################
 
+import queue
 import tkinter as tk
-import threading
 from itemrobot import Item, Robot, LargeRobot, SmallRobot
+from simulation import Simulation
+from renderer import Renderer, FRAME_INTERVAL
+
+################################### CONSTANTS #####################################
+
+ZOOM_STEP = 1.25  # change of scale per mouse wheel notch
 
 ############################### CLASS DEFINITIONS #################################
 
@@ -26,12 +32,22 @@ from itemrobot import Item, Robot, LargeRobot, SmallRobot
 #               root       : The main Tkinter window
 #               left_frame : Frame for the left section of the window (use to contain the grid)
 #               canvas     : Canvas widget to display the warehouse layout
+#               renderer   : Draws the warehouse on the canvas, frame by frame
+#               pan_anchor : The last pointer position of a right-button drag
 #               main_frame : Frame for the main section of the window (use to contain operation menu)
+#               simulation : The simulation that runs assigned tasks in real time
+#               messages   : (text widget name, message, append) tuples posted by any
+#                            thread and shown by the Tk main loop once per frame
+#
+#  Tk may only be used from the main loop. The update_*_info methods can be
+#  called from the simulation thread, so they only post to messages, and
+#  refresh() shows them together with the changed cells on the next frame.
 #        
 class GUI:
     def __init__(self, warehouse):
         self.warehouse = warehouse
         self.warehouse.gui = self
+        self.simulation = Simulation(warehouse)
         self.root = tk.Tk()
         self.root.title('Automated Warehouse Management System')
 
@@ -39,6 +55,15 @@ class GUI:
         self.left_frame.pack(side='left', fill='both')
         self.canvas = tk.Canvas(self.left_frame, width=1000, height=1000)
         self.canvas.pack()
+        self.renderer = Renderer(self.canvas, warehouse)
+        self.pan_anchor = None
+        self.canvas.bind('<ButtonPress-3>', self.start_pan)
+        self.canvas.bind('<B3-Motion>', self.pan_view)
+        self.canvas.bind('<MouseWheel>', self.zoom_view)  # Windows and macOS
+        self.canvas.bind('<Button-4>', self.zoom_view)    # X11 wheel up
+        self.canvas.bind('<Button-5>', self.zoom_view)    # X11 wheel down
+        self.messages = queue.SimpleQueue()
+        self.root.after(FRAME_INTERVAL, self.refresh)
 
         self.main_frame = tk.Frame(self.root)
         self.main_frame.pack(fill='both')
@@ -177,10 +202,8 @@ class GUI:
         self.item_var = tk.StringVar(self.destination_frame)
         self.item_var.set('Select Item')  # Default value
 
-        item_names = [item.item_name for item in self.warehouse.items]  # Get the item names from the warehouse
-        if item_names:
-            item_names = list(set(item_names)) 
-        else:
+        item_names = self.warehouse.item_names()  # Get the item names from the warehouse
+        if not item_names:
             item_names = ['No Items Available'] 
 
         self.item_menu = tk.OptionMenu(self.destination_frame, self.item_var, *item_names)
@@ -233,10 +256,8 @@ class GUI:
         self.item_var = tk.StringVar(self.items_frame)
         self.item_var.set('Select Item')  # Default value
 
-        item_names = [item.item_name for item in self.warehouse.items]  # Get the item names from the warehouse
-        if item_names:
-            item_names = list(set(item_names)) 
-        else:
+        item_names = self.warehouse.item_names()  # Get the item names from the warehouse
+        if not item_names:
             item_names = ['No Items Available'] 
 
         self.item_menu = tk.OptionMenu(self.items_frame, self.item_var, *item_names)
@@ -262,8 +283,8 @@ class GUI:
             length = int(self.length_entry.get())
             width = int(self.width_entry.get())
             if length > 0 and width > 0:
-                self.warehouse.length = length
-                self.warehouse.width = width
+                with self.warehouse.lock:
+                    self.warehouse.resize(length, width)
                 self.update_display()
             else:
                 self.update_size_info('Please enter positive values for length and width.')
@@ -274,10 +295,7 @@ class GUI:
         # Place items in the warehouse by clicking with the mouse.
 
         # Convert mouse click coordinates to grid coordinates.
-        cell_width = 700 // self.warehouse.width
-        cell_height = 700 // self.warehouse.length
-        x = event.x // cell_width
-        y = event.y // cell_height
+        x, y = self.renderer.cell_at(event.x, event.y)
 
         if self.is_valid_grid_position(x, y):
             # Set item position.
@@ -290,18 +308,14 @@ class GUI:
                 return
 
             if item_name:
-                existing_item = next((item for item in self.warehouse.items if item.item_name == item_name), None)
-                if existing_item:
-                    item_id = existing_item.item_id
+                record = self.warehouse.stock.get(item_name)
+                if record:
+                    item_id = record.item_id
                 else:
-                    item_names = [item.item_name for item in self.warehouse.items]  # Get the item names from the warehouse
-                    if item_names:
-                        item_names = list(set(item_names)) 
-                    else:
-                        item_names = []
-                    item_id = len(item_names) + 1
+                    item_id = len(self.warehouse.stock) + 1
                 new_item = Item(item_name=item_name, item_id=item_id, position=(x, y), unit_weight=item_weight, quantity=item_quantity)
-                self.warehouse.add_item(new_item)
+                with self.warehouse.lock:
+                    self.warehouse.add_item(new_item)
             else:
                 self.update_item_info('Item name cannot be empty.')
 
@@ -314,10 +328,7 @@ class GUI:
         # Place robots in the warehouse by clicking with the mouse.
 
         # Convert mouse click coordinates to grid coordinates.
-        cell_width = 700 // self.warehouse.width
-        cell_height = 700 // self.warehouse.length
-        x = event.x // cell_width
-        y = event.y // cell_height
+        x, y = self.renderer.cell_at(event.x, event.y)
 
         if self.is_valid_grid_position(x, y):
 
@@ -333,7 +344,8 @@ class GUI:
                 new_robot = Robot(robot_id)
                 
             new_robot.position = (x, y)
-            self.warehouse.add_robot(new_robot)
+            with self.warehouse.lock:
+                self.warehouse.add_robot(new_robot)
             # Update display.
             self.update_display()
         else:
@@ -344,10 +356,12 @@ class GUI:
         for widget in self.results_frame.winfo_children():
             widget.destroy()
         if self.warehouse.items:
-            for item in self.warehouse.items:
-                if item.item_name == self.item_var.get():
-                    item_info = f"Name: {item.item_name}, ID: {item.item_id}\nPosition: {item.position}, Unit Weight: {item.unit_weight} kg, Quantity: {item.quantity}, Total Weight: {item.weight} kg."
-                    tk.Label(self.results_frame, text=item_info, font=("Arial", 10)).pack(pady=10, anchor='w')
+            for item in self.warehouse.items_named(self.item_var.get()):
+                item_info = f"Name: {item.item_name}, ID: {item.item_id}\nPosition: {item.position}, Unit Weight: {item.unit_weight} kg, Quantity: {item.quantity}, Total Weight: {item.weight} kg."
+                tk.Label(self.results_frame, text=item_info, font=("Arial", 10)).pack(pady=10, anchor='w')
+            quantity, weight = self.warehouse.stock_of(self.item_var.get())
+            if quantity:
+                tk.Label(self.results_frame, text=f"In stock: Quantity: {quantity}, Total Weight: {weight} kg.", font=("Arial", 10, "bold")).pack(pady=10, anchor='w')
         else:
             tk.Label(self.results_frame, text="No items available", font=("Arial", 10)).pack(pady=10, anchor='w')
 
@@ -358,7 +372,7 @@ class GUI:
         if self.warehouse.robots:
             for robot in self.warehouse.robots:
                 if robot.robot_type == self.robot_var.get():
-                    robot_info = f"Type: {robot.robot_type}, ID: {robot.robot_id}, Speed: {robot.speed} grid/s, Position: {robot.position}."
+                    robot_info = f"Type: {robot.robot_type}, ID: {robot.robot_id}, Speed: {robot.speed:g} grid/s, Position: {robot.position}."
                     tk.Label(self.results_frame, text=robot_info, font=("Arial", 10)).pack(pady=10, anchor='w')
         else:
             tk.Label(self.results_frame, text="No robots available", font=("Arial", 10)).pack(pady=10, anchor='w')
@@ -368,42 +382,44 @@ class GUI:
         try:
             x = int(self.destination_x_entry.get())
             y = int(self.destination_y_entry.get())
-            
-            if 0 <= x < self.warehouse.width and 0 <= y < self.warehouse.length:
-                self.warehouse.append_destination((x, y))
-                self.update_task_info(f"Added destination at ({x}, {y})")
-                self.update_display()
-            else:
-                self.update_task_info("Invalid destination coordinates")
+            quantity = int(self.quantity_entry.get())
         except ValueError:
-            self.update_task_info("Please enter valid numeric coordinates")
-        task_thread = threading.Thread(target=self.warehouse.assign_task, args=(self,))
-        task_thread.start()
+            self.update_task_info("Please enter valid numeric coordinates and quantity")
+            return
+
+        if 0 <= x < self.warehouse.width and 0 <= y < self.warehouse.length:
+            self.update_task_info(f"Added destination at ({x}, {y})")
+            self.update_display()
+        else:
+            self.update_task_info("Invalid destination coordinates")
+            return
+
+        try:
+            order_id = self.warehouse.submit_order(self.item_var.get(), quantity, (x, y))
+        except ValueError as error:
+            self.update_task_info(str(error))
+            return
+        self.update_task_info(f"Order {order_id} queued.")
+        self.simulation.run_in_background(realtime=True)
 
     def update_display(self):
-        # Update the display of the warehouse
-        self.canvas.delete('all')
-
-        # Draw warehouse grid.
-        cell_width = 700 // self.warehouse.width
-        cell_height = 700 // self.warehouse.length
-
-        for x in range(self.warehouse.width):
-            for y in range(self.warehouse.length):
-                self.canvas.create_rectangle(x * cell_width, y * cell_height, (x + 1) * cell_width, (y + 1) * cell_height, outline='gray')
-
-        # Draw robot position.
-        for robot in self.warehouse.robots:
-            x, y = robot.position
-            color = 'blue' if robot.robot_type == 'standard' else ('green' if robot.robot_type == 'large' else 'red')
-            self.canvas.create_rectangle(x * cell_width, y * cell_height, (x + 1) * cell_width, (y + 1) * cell_height, fill=color)
-            self.canvas.create_text((x + 0.5) * cell_width, (y + 0.5) * cell_height, text=f'{robot.robot_type[0].upper()}{robot.robot_id}', fill='white')
-
-        # Draw item position.
-        for item in self.warehouse.items:
-            x, y = item.position
-            self.canvas.create_rectangle(x * cell_width, y * cell_height, (x + 1) * cell_width, (y + 1) * cell_height, fill='orange')
-            self.canvas.create_text((x + 0.5) * cell_width, (y + 0.5) * cell_height, text=f'{item.item_name}\n{item.weight}kg', fill='white')
+        # Draw the changes made to the warehouse since the last frame right away
+        self.renderer.render()
+
+    def start_pan(self, event):
+        # Remember where a right-button drag started
+        self.pan_anchor = (event.x, event.y)
+
+    def pan_view(self, event):
+        # Drag the view with the right mouse button
+        x, y = self.pan_anchor
+        self.renderer.pan(event.x - x, event.y - y)
+        self.pan_anchor = (event.x, event.y)
+
+    def zoom_view(self, event):
+        # Zoom in or out around the pointer with the mouse wheel
+        zoom_in = event.num == 4 or event.delta > 0
+        self.renderer.zoom_at(ZOOM_STEP if zoom_in else 1 / ZOOM_STEP, event.x, event.y)
 
     def run(self):
         # Run the gui
@@ -412,31 +428,64 @@ class GUI:
     def update_size_info(self, message):
         # Update the infomation displayed in 'Set Warehouse Size' menu
         "update"
-        self.size_info_text.delete(1.0, tk.END)
-        self.size_info_text.insert(tk.END, message)
+        self.messages.put(('size_info_text', message, False))
 
     def update_item_info(self, message):
         # Update the infomation displayed in 'Place Items' menu
         "update"
-        self.item_info_text.delete(1.0, tk.END)
-        self.item_info_text.insert(tk.END, message)
+        self.messages.put(('item_info_text', message, False))
 
     def update_robot_info(self, message):
         # Update the infomation displayed in 'Place Robots' menu
         "update"
-        self.robot_info_text.delete(1.0, tk.END)
-        self.robot_info_text.insert(tk.END, message)
+        self.messages.put(('robot_info_text', message, False))
 
     def update_task_info(self, message):
         # Update the infomation displayed in 'Assign task' menu
         "update"
-        self.task_info_text.delete(1.0, tk.END)
-        self.task_info_text.insert(tk.END, message)
+        self.messages.put(('task_info_text', message, False))
 
     def add_task_info(self, message):
         # Add the infomation displayed in 'Assign task' menu
         "add"
-        self.task_info_text.insert(tk.END, message)
+        self.messages.put(('task_info_text', message, True))
+
+    def refresh(self):
+        # Show the posted messages and draw the changed cells, then schedule the next frame
+        self.show_messages()
+        self.renderer.render()
+        self.root.after(FRAME_INTERVAL, self.refresh)
+
+    def show_messages(self, limit=10000):
+        """
+        Show the messages posted since the last frame. Only the final text of
+        each widget is drawn: a replacing message drops the ones before it.
+
+        Args:
+            limit (int, optional): The most messages taken in one frame; the
+                rest wait for the next one. Defaults to 10000.
+
+        Returns:
+            None
+        """
+        latest = {}  # widget name -> (replace the widget's text, text to insert)
+        for _ in range(limit):
+            try:
+                name, message, append = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if append:
+                replace, text = latest.get(name, (False, ''))
+                latest[name] = (replace, text + message)
+            else:
+                latest[name] = (True, message)
+        for name, (replace, text) in latest.items():
+            widget = getattr(self, name, None)
+            if widget is None or not widget.winfo_exists():
+                continue  # its menu is not shown
+            if replace:
+                widget.delete(1.0, tk.END)
+            widget.insert(tk.END, text)
 
     def center_window(self, width, height):
         # To ensure the GUI window appears in an appropriate position on the screen
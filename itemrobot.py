@@ -7,14 +7,13 @@
 #  Description:  This module contains the core definitions of the Item and Robot  #
 #                classes. It includes methods for item management, robot movement #
 #                using A* path planning, load handling, and task execution in a   #
-#                dynamic warehouse environment.                                   #
+#                dynamic warehouse environment, including multi-pick tours.       #
 ###################################################################################
 
 #################################### IMPORTS ######################################
 
-import time
-from path import PathPlanner
 from collections import deque
+from assignment import tour_order
 
 ############################### CLASS DEFINITIONS #################################
 
@@ -29,7 +28,12 @@ from collections import deque
 #               weight      : The total weight of the item
 #               state       : Determine whether the item can be operated on; True means it can, and the default is True.
 #
+#  Items and robots use __slots__: a large warehouse holds hundreds of
+#  thousands of them, and slots make them smaller and faster to read.
+#
 class Item:
+    __slots__ = ('item_name', 'item_id', 'position', 'unit_weight', 'quantity', 'weight', 'state')
+
     def __init__(self, item_name, item_id, position, unit_weight, quantity, state = True):  # Added weight parameter
         self.item_name = item_name
         self.item_id = item_id
@@ -58,8 +62,16 @@ class Item:
 #               current_load  : The current load of the robot
 #               carried_items : The current carried items of the robot
 #               state         : Determine whether the robot can be assigned task; True means it can, and the default is True.
+#               patience      : How many steps the robot waits for a blocked cell before giving up a route.
+#               fleet         : The FleetStore holding the robot's position, load, capacity,
+#                               speed and state, or None (see fleet.py)
+#               slot          : The robot's row in fleet
+#               steps         : The number of cells the robot has moved
 #
 class Robot:
+    __slots__ = ('robot_id', 'capacity', 'speed', 'position', 'robot_type', 'current_load',
+                 'carried_items', 'state', 'patience', 'fleet', 'slot', 'steps')
+
     def __init__(self, robot_id, initial_position=(0, 0)):
         self.robot_id = robot_id
         self.capacity = 20   # kg (default capacity)
@@ -69,6 +81,10 @@ class Robot:
         self.current_load = 0
         self.carried_items = []
         self.state = True
+        self.patience = 10
+        self.fleet = None
+        self.slot = None
+        self.steps = 0
 
     def calculate_distance(self, point1, point2):
         # calculate distance
@@ -98,7 +114,7 @@ class Robot:
         # Release load
         self.current_load = 0
 
-    def free_position(self, gui):
+    def free_position(self, warehouse):
         # Reference chatGPT. Find the positions where neither items nor robots have been placed.
         x, y = self.position
     
@@ -106,14 +122,13 @@ class Robot:
         visited = set()
         visited.add((x, y))
     
-        max_x = gui.warehouse.length
-        max_y = gui.warehouse.width
+        max_x = warehouse.length
+        max_y = warehouse.width
 
         while queue:
             current_x, current_y = queue.popleft()
 
-            if not any(item.position == (current_x, current_y) for item in gui.warehouse.items) and \
-               not any(robot.position == (current_x, current_y) for robot in gui.warehouse.robots):
+            if warehouse.is_free((current_x, current_y)):
                 return (current_x, current_y)
 
             for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
@@ -124,197 +139,241 @@ class Robot:
     
         return None
 
-    def concession(self, gui):
-        # If the robot is docked at the target location, it needs to move to a different position
-        planner = PathPlanner(gui.warehouse.length, gui.warehouse.width)
-        for item in gui.warehouse.items:
-            planner.set_obstacle(item.position)
-
-
-        for other_robot in gui.warehouse.robots:
-            if other_robot != self:
-                planner.set_obstacle(other_robot.position)
-        
-        rest_position = self.free_position(gui)
-        path_to_rest = planner.find_path(self.position, rest_position)
-        if gui.warehouse.destination:
-            gui.warehouse.destination.pop(0)
-        if path_to_rest:
-            for step in path_to_rest:
-                self.position = step
-                gui.update_display()
-                gui.root.update()
-                time.sleep(1/self.speed)
-        else:
-            gui.update_task_info(f"Robot {self.robot_id} cannot find a valid rest position.")
+    def destination_blocker(self, warehouse, item, destination):
+        # Return a different kind of item already sitting on the destination, if any.
+        other_item = warehouse.item_at(destination)
+        if other_item is not None and other_item.item_name != item.item_name:
+            return other_item
+        return None
+
+    def travel(self, warehouse, planner, goal, passable=(), interrupt=None):
+        """
+        Walk to goal, replanning from the current position before every step.
+        Simulation process: yields (robot, next_position) requests. When the
+        scheduler refuses a step (another robot claimed the cell), no route
+        exists right now, or the route simply stops getting shorter (two robots
+        dodging each other back and forth), the robot keeps trying for up to
+        self.patience steps before giving up.
+
+        Args:
+            interrupt (callable, optional): Checked after every step; the trip is
+                abandoned as soon as it returns a truthy value.
+
+        Returns:
+            bool: True once the robot stands on goal.
+        """
+        waited = 0
+        best = None  # shortest remaining route seen so far
+        # Incremental and cooperative searches keep their state for the whole
+        # trip; without one, a fresh A* search runs before every step.
+        search = warehouse.route_search(self, planner, goal, passable)
+        try:
+            while self.position != goal:
+                if search is not None:
+                    path = search.find_path(self.position)
+                else:
+                    path = planner.find_path(self.position, goal, passable)
+                position = self.position
+                if path and path[1] == position:
+                    yield self, None  # a planned wait, letting another robot pass
+                    moved = False
+                elif path:
+                    moved = yield self, path[1]
+                else:
+                    moved = False
+                    yield self, None
+                # Waits in a cooperative plan do not bring the goal any closer.
+                remaining = sum(1 for a, b in zip(path, path[1:]) if a != b) - (1 if moved else 0) if path else None
+                if remaining is not None and (best is None or remaining < best):
+                    best = remaining
+                    waited = 0
+                else:
+                    waited += 1
+                    if waited > self.patience:
+                        return False
+                if interrupt and interrupt():
+                    return False
+            return True
+        finally:
+            if search is not None:
+                search.close()
+
+    def concession(self, warehouse):
+        """
+        If the robot is docked at the target location, it needs to move to a different position.
+        Simulation process: yields (robot, next_position) for every step.
+        """
+        planner = warehouse.path_planner()
+
+        rest_position = self.free_position(warehouse)
+        if rest_position is None or not (yield from self.travel(warehouse, planner, rest_position)):
+            warehouse.update_task_info(f"Robot {self.robot_id} cannot find a valid rest position.")
         return
 
-    def perform_task(self, item, destination, gui, quantity):
+    def perform_task(self, item, destination, warehouse, quantity):
         """
         Perform the task of moving to the selected item's location, picking it up,
         and delivering it to the destination using A* path planning.
-        """
 
-        warehouse = gui.warehouse  # Use gui.warehouse to access the warehouse
+        This is a simulation process (see simulation.py): it yields
+        (robot, next_position) for every step it wants to take and the
+        scheduler moves the robot when its speed allows and the cell is free.
+        Returns True once the item has been delivered.
+        """
 
         if not self.can_carry(item, quantity):
             print(f"Robot {self.robot_id} cannot carry item {item.item_id}: "
                   f"weight {item.weight * quantity} exceeds capacity {self.capacity}.")
-            gui.update_task_info(f"Robot {self.robot_id} cannot carry {item.item_name}.")
+            warehouse.update_task_info(f"Robot {self.robot_id} cannot carry {item.item_name}.")
             item.state = True
-            if warehouse.destination:
-                warehouse.destination.pop(0)
             return False
 
-        # Initialize the path planner
-        planner = PathPlanner(warehouse.length, warehouse.width)
-
-        # Set obstacles: all other item positions and other robots' positions
-        for other_item in warehouse.items:
-            if other_item != item and other_item.position != destination:  # Exclude the target item
-                planner.set_obstacle(other_item.position)
-            if other_item.position == destination and other_item.item_name != item.item_name:
-                gui.update_task_info(f"Destination is occupied by {other_item.item_name}.")
-                item.state = True
-                return False
-
-        for other_robot in warehouse.robots:
-            if other_robot != self and other_robot.position != destination:  # Exclude the current robot
-                planner.set_obstacle(other_robot.position)
+        # Initialize the path planner on the shared occupancy map. The target
+        # item and the destination are never obstacles for this task.
+        planner = warehouse.path_planner()
+        passable = (item.position, destination)
+        blocked = lambda: self.destination_blocker(warehouse, item, destination)
+        blocker = blocked()
+        if blocker:
+            warehouse.update_task_info(f"Destination is occupied by {blocker.item_name}.")
+            item.state = True
+            return False
 
         # Step 1: Move to the item's position
         print(f"Robot {self.robot_id} moving to pick up {item.item_name}.")
-        path_to_item = planner.find_path(self.position, item.position)
-        if not path_to_item:
-            gui.update_task_info(f"Robot {self.robot_id} cannot reach {item.item_name} at {item.position}.")
+        if not (yield from self.travel(warehouse, planner, item.position, passable, blocked)):
+            blocker = blocked()
+            if blocker:
+                warehouse.update_task_info(f"Destination is occupied by {blocker.item_name}.")
+            else:
+                warehouse.update_task_info(f"Robot {self.robot_id} cannot reach {item.item_name} at {item.position}.")
             item.state = True
-            if warehouse.destination:
-                warehouse.destination.pop(0)
             return False
 
-        while path_to_item and self.position != item.position:
-            step = path_to_item[1]  # Take the first step in the path
-            self.position = step
-            gui.update_display()
-            gui.root.update()
-            time.sleep(1 / self.speed)
-            # Clear all obstacles and reset them
-            planner.clear_obstacle()
-
-            # Re-set the obstacles again (all other items and robots)
-            for other_item in warehouse.items:
-                if other_item != item and other_item.position != destination:
-                    planner.set_obstacle(other_item.position)
-                if other_item.position == destination and other_item.item_name != item.item_name:
-                    gui.update_task_info(f"Destination is occupied by {other_item.item_name}.")
-                    item.state = True
-                    if warehouse.destination:
-                        warehouse.destination.pop(0)
-                    return False
-
-            for other_robot in warehouse.robots:
-                if other_robot != self and other_robot.position != destination:
-                    planner.set_obstacle(other_robot.position)
-
-            # Find a new path to the item
-            path_to_item = planner.find_path(self.position, item.position)
-            if not path_to_item:
-                gui.update_task_info(f"Robot {self.robot_id} cannot reach {item.item_name} at {item.position}.")
-                item.state = True
-                if warehouse.destination:
-                    warehouse.destination.pop(0)
-                return False
-
         # Step 2: Check the path to the destination
         print(f"Robot {self.robot_id} delivering {item.item_name} to destination {destination}.")
-        path_to_destination = planner.find_path(item.position, destination)
-        while not path_to_destination:
-            gui.update_task_info(f"Robot {self.robot_id} cannot reach destination {destination}. Redirecting to rest.")
-            rest_position = self.free_position(gui)
-            gui.update_task_info(f"Robot {self.robot_id} moving to rest position {rest_position}.")
-            path_to_rest = planner.find_path(self.position, rest_position)
+        if not planner.find_path(item.position, destination, passable):
+            warehouse.update_task_info(f"Robot {self.robot_id} cannot reach destination {destination}. Redirecting to rest.")
             item.state = True
-            if warehouse.destination:
-                warehouse.destination.pop(0)
-            if path_to_rest:
-                for step in path_to_rest:
-                    self.position = step
-                    gui.update_display()
-                    gui.root.update()
-                    time.sleep(1 / self.speed)
-            else:
-                gui.update_task_info(f"Robot {self.robot_id} cannot find a valid rest position.")
+            yield from self.return_to_rest(warehouse, planner, passable)
             return False
 
         # Step 3: Pick up the item
         if self.pick_item(item, quantity):
-            gui.update_task_info(f"Robot {self.robot_id} picked up {item.item_name}.")
+            warehouse.update_task_info(f"Robot {self.robot_id} picked up {item.item_name}.")
             print(f"Robot {self.robot_id} picked up {item.item_name}.")
-            item.quantity -= quantity
-            item.weight -= item.unit_weight * quantity
+            warehouse.take_item(item, quantity)
+            warehouse.record('pickup', self.robot_type, self.robot_id, *item.position, quantity, self.current_load)
             if item.quantity > 0:
                 item.state = True
-            warehouse.remove_item()
 
         # Step 4: Move to the destination
-        while path_to_destination and self.position != destination:
-            step = path_to_destination[1]  # Take the first step in the path
-            self.position = step
-            gui.update_display()
-            gui.root.update()
-            time.sleep(1 / self.speed)
-            # Clear all obstacles and reset them
-            planner.clear_obstacle()
-
-            # Re-set the obstacles again (all other items and robots)
-            for other_item in warehouse.items:
-                if other_item != item and other_item.position != destination:
-                    planner.set_obstacle(other_item.position)
-                if other_item.position == destination and other_item.item_name != item.item_name:
-                    gui.update_task_info(f"Destination is occupied by {other_item.item_name}.")
-                    return False
-
-            for other_robot in warehouse.robots:
-                if other_robot != self and other_robot.position != destination:
-                    planner.set_obstacle(other_robot.position)
-
-            # Find a new path to the item
-            path_to_destination = planner.find_path(self.position, destination)
-            if not path_to_destination:
-                gui.update_task_info(f"Robot {self.robot_id} cannot reach {item.item_name} at {item.position}.")
-                if warehouse.destination:
-                    warehouse.destination.pop(0)
-                return False
+        if not (yield from self.travel(warehouse, planner, destination, passable, blocked)):
+            blocker = blocked()
+            if blocker:
+                warehouse.update_task_info(f"Destination is occupied by {blocker.item_name}.")
+            else:
+                warehouse.update_task_info(f"Robot {self.robot_id} cannot reach destination {destination}.")
+            return False
 
         # Step 5: Complete the task
         new_item = Item(item_name=item.item_name, item_id=item.item_id, position=destination, unit_weight=item.unit_weight, quantity=quantity)
         warehouse.create_item(new_item)
         self.release_load()
-        gui.update_display()
-        gui.root.update()
-        gui.update_task_info(f"Robot {self.robot_id} delivered {item.item_name} to destination {destination}.")
-        if warehouse.destination:
-            warehouse.destination.pop(0)
+        warehouse.record('deliver', self.robot_type, self.robot_id, *destination, quantity, self.current_load)
+        warehouse.update_task_info(f"Robot {self.robot_id} delivered {item.item_name} to destination {destination}.")
 
         # Step 6: Return to rest
-        rest_position = self.free_position(gui)
-        gui.update_task_info(f"Robot {self.robot_id} returning to rest {rest_position}.")
-        path_to_rest = planner.find_path(destination, rest_position)
-        if not path_to_rest:
-            gui.update_task_info(f"Robot {self.robot_id} cannot return to origin.")
-            return
-
-        for step in path_to_rest:
-            self.position = step
-            gui.update_display()
-            gui.root.update()
-            time.sleep(1 / self.speed)
+        yield from self.return_to_rest(warehouse, planner, passable)
 
         self.state = True
 
         return True
 
+    def perform_tour(self, lines, warehouse):
+        """
+        Pick several order lines in one trip, then deliver them one after another.
+
+        The pickups are visited in the order chosen by tour_order from the
+        robot's position, and the destinations of the lines picked up in the
+        order chosen from the last pickup. A line that cannot be picked up or
+        delivered is skipped; the rest of the tour goes on.
+        Simulation process: yields (robot, next_position) for every step.
+
+        Args:
+            lines (list): (item, destination, quantity) tuples whose total
+                weight fits the robot's capacity.
+            warehouse (Warehouse): The warehouse the robot works in.
+
+        Returns:
+            list: For each line, the quantity delivered (0 if it failed).
+        """
+        delivered = [0] * len(lines)
+        if sum(item.unit_weight * quantity for item, _, quantity in lines) + self.current_load > self.capacity:
+            warehouse.update_task_info(f"Robot {self.robot_id} cannot carry all {len(lines)} lines of its tour.")
+            for item, _, _ in lines:
+                item.state = True
+            return delivered
+
+        planner = warehouse.path_planner()
+        picked = []
+        for index in tour_order(self.position, [item.position for item, _, _ in lines]):
+            item, destination, quantity = lines[index]
+            blocker = self.destination_blocker(warehouse, item, destination)
+            if blocker:
+                warehouse.update_task_info(f"Destination is occupied by {blocker.item_name}.")
+                item.state = True
+                continue
+            if not (yield from self.travel(warehouse, planner, item.position, (item.position,))):
+                warehouse.update_task_info(f"Robot {self.robot_id} cannot reach {item.item_name} at {item.position}.")
+                item.state = True
+                continue
+            quantity = min(quantity, item.quantity)
+            if quantity > 0 and self.pick_item(item, quantity):
+                warehouse.update_task_info(f"Robot {self.robot_id} picked up {item.item_name}.")
+                warehouse.take_item(item, quantity)
+                warehouse.record('pickup', self.robot_type, self.robot_id, *item.position, quantity, self.current_load)
+                picked.append((index, quantity))
+            if item.quantity > 0:
+                item.state = True
+
+        for stop in tour_order(self.position, [lines[index][1] for index, _ in picked]):
+            index, quantity = picked[stop]
+            item, destination, _ = lines[index]
+            blocker = self.destination_blocker(warehouse, item, destination)
+            if blocker or not (yield from self.travel(warehouse, planner, destination, (destination,))):
+                if blocker:
+                    warehouse.update_task_info(f"Destination is occupied by {blocker.item_name}.")
+                else:
+                    warehouse.update_task_info(f"Robot {self.robot_id} cannot reach destination {destination}.")
+                continue
+            warehouse.create_item(Item(item_name=item.item_name, item_id=item.item_id, position=destination,
+                                       unit_weight=item.unit_weight, quantity=quantity))
+            self.current_load -= item.unit_weight * quantity
+            self.carried_items.remove(item)
+            delivered[index] = quantity
+            warehouse.record('deliver', self.robot_type, self.robot_id, *destination, quantity, self.current_load)
+            warehouse.update_task_info(f"Robot {self.robot_id} delivered {item.item_name} to destination {destination}.")
+
+        # As in perform_task, a load that could not be delivered is not put back.
+        self.release_load()
+        self.carried_items.clear()
+        yield from self.return_to_rest(warehouse, planner)
+        return delivered
+
+    def return_to_rest(self, warehouse, planner, passable=()):
+        """
+        Move out of the way to the nearest free position.
+        Simulation process: yields (robot, next_position) for every step.
+        """
+        rest_position = self.free_position(warehouse)
+        warehouse.update_task_info(f"Robot {self.robot_id} returning to rest {rest_position}.")
+        if rest_position is None or not (yield from self.travel(warehouse, planner, rest_position, passable)):
+            warehouse.update_task_info(f"Robot {self.robot_id} cannot find a valid rest position.")
+
 class LargeRobot(Robot):
+    __slots__ = ()
+
     def __init__(self, robot_id, initial_position=(0, 0)):
         super().__init__(robot_id, initial_position)
         self.robot_type = 'large'
@@ -325,6 +384,8 @@ class LargeRobot(Robot):
         return 5000  # max working distance of large robot
 
 class SmallRobot(Robot):
+    __slots__ = ()
+
     def __init__(self, robot_id, initial_position=(0, 0)):
         super().__init__(robot_id, initial_position)
         self.robot_type = 'mini'
@@ -332,4 +393,10 @@ class SmallRobot(Robot):
         self.speed = 5        # grid/s (faster due to smaller size)
 
     def max_distance(self):
-        return 6000  # max working distance of small robot
\ No newline at end of file
+        return 6000  # max working distance of small robot
+
+################################### CONSTANTS #####################################
+
+# Robot type name -> class; the names are the robot_type of the instances.
+# Used to create robots from CSV rows, event logs and layout files.
+ROBOT_CLASSES = {'standard': Robot, 'large': LargeRobot, 'mini': SmallRobot}
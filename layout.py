@@ -0,0 +1,232 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         layout.py                                                        #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Save and load warehouse layouts in a compact binary file.        #
+#  Description:  A layout file holds the dimensions, the item slots, the robots   #
+#                and the pending destinations of a warehouse. Every attribute is  #
+#                stored as one packed column (all positions, then all quantities, #
+#                ...) and item names once in a string table, so the file is small #
+#                and LayoutFile can read it through a memory map: opening a file  #
+#                only reads the header, and each column is a zero-copy view.      #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+import mmap
+import struct
+import sys
+from array import array
+from warehouse import Warehouse
+from itemrobot import Item, ROBOT_CLASSES
+
+################################### CONSTANTS #####################################
+
+MAGIC = b'AWLY'
+VERSION = 1
+# magic, version, reserved, length, width, items, robots, destinations, names
+HEADER = struct.Struct('<4sHHIIQIII')
+ROBOT_TYPES = ('standard', 'large', 'mini')  # robot type codes of the file: index in this tuple
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+############################### CLASS DEFINITIONS #################################
+
+#===============================================================
+#  Class:       LayoutFile
+#  Attributes:
+#               length, width : The dimensions of the warehouse
+#               names         : The item names, in string table order
+#               item_names    : Per slot, the index of its name in names
+#               item_cells    : Per slot, its cell id (x * width + y)
+#               item_ids      : Per slot, the item ID
+#               unit_weights  : Per slot, the unit weight
+#               quantities    : Per slot, the quantity
+#               robot_ids, robot_types, robot_cells : Per robot, its ID, its index
+#                               in ROBOT_TYPES and its cell id
+#               destinations  : The cell ids of the pending destinations
+#
+#  The columns are memoryviews onto the memory-mapped file (array copies on
+#  big-endian machines), so they are only valid until close().
+#
+class LayoutFile:
+    def __init__(self, filename):
+        with open(filename, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.views = []
+        try:
+            self.read()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        # The number of item slots
+        return len(self.item_cells)
+
+    def read(self):
+        # Parse the header and map every column
+        if len(self.map) < HEADER.size:
+            raise ValueError("Layout file is truncated.")
+        magic, version, _, self.length, self.width, items, robots, destinations, names = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a warehouse layout file (or an unsupported version).")
+        self.offset = -(-HEADER.size // 8) * 8
+        name_offsets = self.column('Q', names + 1)
+        blob = self.column('B', name_offsets[-1] if names else 0)
+        self.names = [bytes(blob[name_offsets[index]:name_offsets[index + 1]]).decode('utf-8')
+                      for index in range(names)]
+        self.item_names = self.column('I', items)
+        self.item_cells = self.column('I', items)
+        self.item_ids = self.column('q', items)
+        self.unit_weights = self.column('d', items)
+        self.quantities = self.column('q', items)
+        self.robot_ids = self.column('q', robots)
+        self.robot_types = self.column('B', robots)
+        self.robot_cells = self.column('I', robots)
+        self.destinations = self.column('I', destinations)
+
+    def column(self, typecode, count):
+        # The next column of count values, as a view onto the map
+        size = array(typecode).itemsize * count
+        if self.offset + size > len(self.map):
+            raise ValueError("Layout file is truncated.")
+        view = memoryview(self.map)[self.offset:self.offset + size]
+        self.views.append(view)
+        self.offset += -(-size // 8) * 8  # columns start on 8-byte boundaries
+        if LITTLE_ENDIAN:
+            view = view.cast(typecode)
+            self.views.append(view)
+            return view
+        values = array(typecode, view)
+        values.byteswap()
+        return values
+
+    def close(self):
+        """Release the column views and unmap the file."""
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.map.close()
+
+    def item(self, index):
+        """
+        Build the Item for one slot.
+
+        Args:
+            index (int): The slot number.
+
+        Returns:
+            Item: The item stored in that slot.
+        """
+        x, y = divmod(self.item_cells[index], self.width)
+        return Item(self.names[self.item_names[index]], self.item_ids[index], (x, y),
+                    self.unit_weights[index], self.quantities[index])
+
+    def to_warehouse(self, **options):
+        """
+        Build a Warehouse holding this layout.
+
+        The slots go in with Warehouse.store_items in one pass, without
+        add_item's checks and messages; the layout was saved from a
+        consistent warehouse.
+
+        Args:
+            **options: Passed on to the Warehouse constructor (e.g. gui).
+
+        Returns:
+            Warehouse: The new warehouse.
+        """
+        width = self.width
+        names = self.names
+        warehouse = Warehouse(self.length, width, **options)
+        warehouse.store_items([Item(names[name], item_id, divmod(cell, width), unit_weight, quantity)
+                               for name, cell, item_id, unit_weight, quantity
+                               in zip(self.item_names, self.item_cells, self.item_ids,
+                                      self.unit_weights, self.quantities)])
+        for robot_id, robot_type, cell in zip(self.robot_ids, self.robot_types, self.robot_cells):
+            if robot_type >= len(ROBOT_TYPES):
+                raise ValueError(f"Unknown robot type code in the layout file: {robot_type}.")
+            warehouse.add_robot(ROBOT_CLASSES[ROBOT_TYPES[robot_type]](robot_id, divmod(cell, width)))
+        warehouse.destination = [divmod(cell, width) for cell in self.destinations]
+        return warehouse
+
+############################## FUNCTION DEFINITIONS ###############################
+
+def pack(typecode, values):
+    # The little-endian bytes of a column, padded to a multiple of 8 bytes
+    column = array(typecode, values)
+    if not LITTLE_ENDIAN:
+        column.byteswap()
+    data = column.tobytes()
+    return data + bytes(-len(data) % 8)
+
+def save_layout(warehouse, filename):
+    """
+    Save the layout of a warehouse: its dimensions, item slots, robots and
+    pending destinations.
+
+    Args:
+        warehouse (Warehouse): The warehouse to save.
+        filename (str): The file to write.
+
+    Returns:
+        None
+    """
+    width = warehouse.width
+    if warehouse.length * width > 2 ** 32:
+        raise ValueError("Warehouse too large for the layout format.")
+    names = {}
+    for item in warehouse.items:
+        names.setdefault(item.item_name, len(names))
+    encoded = [name.encode('utf-8') for name in names]
+    offsets = [0]
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+    items = warehouse.items
+    robots = warehouse.robots
+    unknown = {robot.robot_type for robot in robots} - set(ROBOT_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown robot types for the layout format: {sorted(unknown)}.")
+    try:
+        sections = [
+            pack('Q', offsets),
+            pack('B', b''.join(encoded)),
+            pack('I', [names[item.item_name] for item in items]),
+            pack('I', [x * width + y for x, y in (item.position for item in items)]),
+            pack('q', [item.item_id for item in items]),
+            pack('d', [item.unit_weight for item in items]),
+            pack('q', [item.quantity for item in items]),
+            pack('q', [robot.robot_id for robot in robots]),
+            pack('B', [ROBOT_TYPES.index(robot.robot_type) for robot in robots]),
+            pack('I', [x * width + y for x, y in (robot.position for robot in robots)]),
+            pack('I', [x * width + y for x, y in warehouse.destination]),
+        ]
+    except TypeError:
+        raise ValueError("Layout files need integer item and robot IDs and quantities.")
+    header = HEADER.pack(MAGIC, VERSION, 0, warehouse.length, width, len(items), len(robots),
+                         len(warehouse.destination), len(names))
+    with open(filename, 'wb') as file:
+        file.write(header + bytes(-len(header) % 8))
+        file.writelines(sections)
+
+def load_layout(filename, **options):
+    """
+    Load a layout saved with save_layout into a new warehouse.
+
+    Args:
+        filename (str): The layout file.
+        **options: Passed on to the Warehouse constructor (e.g. gui).
+
+    Returns:
+        Warehouse: The new warehouse.
+    """
+    with LayoutFile(filename) as layout:
+        return layout.to_warehouse(**options)
@@ -11,11 +11,17 @@
 
 #################################### IMPORTS ######################################
 
+import os
 from warehouse import Warehouse
 from gui import GUI
+from metrics import METRICS
 
 ############################## MAIN PROGRAM EXECUTION #############################
 if __name__ == '__main__':
+    # WAREHOUSE_METRICS=metrics.json (or metrics.prom) dumps the metrics every 10 s.
+    metrics_file = os.environ.get('WAREHOUSE_METRICS')
+    if metrics_file:
+        METRICS.start_dump(metrics_file, fmt='prometheus' if metrics_file.endswith('.prom') else 'json')
     warehouse = Warehouse(length=20, width=20)
     gui = GUI(warehouse)
     gui.run()
\ No newline at end of file
@@ -0,0 +1,332 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         metrics.py                                                       #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Measure the performance of the running system.                   #
+#  Description:  METRICS collects counters, gauges and latency histograms from    #
+#                the path planner (calls, expansions, search time), the           #
+#                dispatcher (assignment time, order waiting time, steps per       #
+#                trip), the simulation (robot utilisation and idle time) and the  #
+#                renderer (frame time). They can be read in process with          #
+#                snapshot() or written to a file every few seconds as JSON or     #
+#                Prometheus text, to compare throughput between versions.         #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+import bisect
+import json
+import os
+import threading
+import time
+
+################################### CONSTANTS #####################################
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1, 2.5, 5, 10)
+WAIT_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)  # simulated seconds
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 100000, 1000000)
+
+############################### CLASS DEFINITIONS #################################
+
+#===============================================================
+#  Class:       Histogram
+#  Attributes:
+#               bounds : The upper bounds of the buckets, ascending
+#               counts : Per bucket, the observations at most its bound and above
+#                        the previous one; the last entry counts those above every bound
+#               total  : The sum of all observations
+#               count  : The number of observations
+#               high   : The largest observation
+#
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.count = 0
+        self.high = 0
+
+    def observe(self, value):
+        # Count one observation
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+        if value > self.high:
+            self.high = value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in.
+
+        Args:
+            q (float): The quantile, between 0 and 1 (e.g. 0.95).
+
+        Returns:
+            float: The estimate (the largest observation above the last bound),
+                or 0 without observations.
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return self.high
+
+    def snapshot(self):
+        # The histogram as a dict of plain values
+        cumulative = []
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            cumulative.append([bound, seen])
+        return {'count': self.count, 'sum': self.total, 'max': self.high,
+                'mean': self.total / self.count if self.count else 0,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99),
+                'buckets': cumulative}
+
+#===============================================================
+#  Class:       Metrics
+#  Attributes:
+#               counters   : Key -> value of the counters (only ever increased)
+#               gauges     : Key -> last value of the gauges
+#               histograms : Key -> Histogram
+#               lock       : Guards the three dicts; metrics are updated from the
+#                            simulation thread and the GUI thread
+#               dumper     : The thread writing the periodic dump, or None
+#               stopping   : Set to stop the dump thread
+#               enabled    : Set to False to ignore every update (collectors are
+#                            expected to check it too)
+#               collectors : Objects keeping their own metrics on a hot path, read
+#                            only when the metrics are (see add_collector)
+#
+#  A key is the metric name plus its labels in Prometheus notation, e.g.
+#  'planner_calls_total{algorithm="astar"}'.
+#
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.dumper = None
+        self.stopping = threading.Event()
+        self.enabled = True
+        self.collectors = []
+
+    @staticmethod
+    def key(name, labels):
+        # The metric name with its labels, e.g. name{label="value"}
+        if not labels:
+            return name
+        return name + '{' + ','.join(f'{label}="{value}"' for label, value in sorted(labels.items())) + '}'
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Add to a counter.
+
+        Args:
+            name (str): The counter, e.g. 'orders_submitted_total'.
+            amount (float, optional): The amount to add. Defaults to 1.
+            **labels: Labels telling series of the same counter apart.
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        """
+        Set a gauge to its current value.
+
+        Args:
+            name (str): The gauge, e.g. 'robot_utilisation'.
+            value (float): The value.
+            **labels: Labels telling series of the same gauge apart.
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        key = self.key(name, labels)
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        """
+        Add an observation to a histogram.
+
+        Args:
+            name (str): The histogram, e.g. 'planner_latency_seconds'.
+            value (float): The observation.
+            buckets (tuple, optional): The bucket bounds, used when the histogram
+                is created by its first observation. Defaults to SECONDS_BUCKETS.
+            **labels: Labels telling series of the same histogram apart.
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+        key = self.key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def add_collector(self, collector):
+        """
+        Register an object that counts on a hot path without taking the lock.
+
+        Args:
+            collector (object): Has collect(), yielding ('counter', key, value)
+                and ('histogram', key, Histogram) entries, and reset().
+
+        Returns:
+            None
+        """
+        self.collectors.append(collector)
+
+    def gather(self):
+        # Copies of the counters, gauges and histograms, with the collected ones added
+        with self.lock:
+            counters, gauges, histograms = dict(self.counters), dict(self.gauges), dict(self.histograms)
+        for collector in self.collectors:
+            for kind, key, value in collector.collect():
+                if kind == 'counter':
+                    counters[key] = counters.get(key, 0) + value
+                else:
+                    histograms[key] = value
+        return counters, gauges, histograms
+
+    def counter(self, name, **labels):
+        # The value of a counter (0 if it was never increased)
+        return self.gather()[0].get(self.key(name, labels), 0)
+
+    def histogram(self, name, **labels):
+        # The snapshot of a histogram, or None if it has no observations
+        histogram = self.gather()[2].get(self.key(name, labels))
+        return histogram.snapshot() if histogram is not None else None
+
+    def reset(self):
+        """Forget every metric (e.g. between two benchmark runs)."""
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+        for collector in self.collectors:
+            collector.reset()
+
+    def snapshot(self):
+        """
+        Read every metric at once.
+
+        Returns:
+            dict: {'time': ..., 'counters': {...}, 'gauges': {...},
+                'histograms': {key: Histogram.snapshot()}}.
+        """
+        counters, gauges, histograms = self.gather()
+        return {'time': time.time(),
+                'counters': counters,
+                'gauges': gauges,
+                'histograms': {key: histogram.snapshot() for key, histogram in histograms.items()}}
+
+    def prometheus(self):
+        """
+        Format every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The text.
+        """
+        lines = []
+        typed = set()
+
+        def declare(key, kind):
+            name = key.split('{', 1)[0]
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+            return name, key[len(name):]
+
+        counters, gauges, histograms = self.gather()
+        for key, value in sorted(counters.items()):
+            declare(key, 'counter')
+            lines.append(f'{key} {value}')
+        for key, value in sorted(gauges.items()):
+            declare(key, 'gauge')
+            lines.append(f'{key} {value}')
+        for key, histogram in sorted(histograms.items()):
+            name, labels = declare(key, 'histogram')
+            labels = labels[1:-1] + ',' if labels else ''
+            seen = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                seen += count
+                lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {seen}')
+            lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {histogram.count}')
+            suffix = '{' + labels[:-1] + '}' if labels else ''
+            lines.append(f'{name}_sum{suffix} {histogram.total}')
+            lines.append(f'{name}_count{suffix} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, filename, fmt='json'):
+        """
+        Write every metric to a file, replacing it atomically.
+
+        Args:
+            filename (str): The file to write.
+            fmt (str, optional): 'json' or 'prometheus'. Defaults to 'json'.
+
+        Returns:
+            None
+        """
+        if fmt == 'prometheus':
+            text = self.prometheus()
+        elif fmt == 'json':
+            text = json.dumps(self.snapshot(), indent=1)
+        else:
+            raise ValueError(f"Unknown metrics format: {fmt}.")
+        with open(filename + '.tmp', 'w') as file:
+            file.write(text)
+        os.replace(filename + '.tmp', filename)
+
+    def start_dump(self, filename, interval=10, fmt='json'):
+        """
+        Dump the metrics to a file every interval seconds from a background thread.
+
+        Args:
+            filename (str): The file to write.
+            interval (float, optional): Seconds between dumps. Defaults to 10.
+            fmt (str, optional): 'json' or 'prometheus'. Defaults to 'json'.
+
+        Returns:
+            None
+        """
+        self.stop_dump()
+        self.stopping.clear()
+
+        def run():
+            while not self.stopping.wait(interval):
+                self.dump(filename, fmt)
+            self.dump(filename, fmt)
+        self.dumper = threading.Thread(target=run, daemon=True)
+        self.dumper.start()
+
+    def stop_dump(self):
+        """Stop the periodic dump, after writing the file one last time."""
+        if self.dumper is not None:
+            self.stopping.set()
+            self.dumper.join()
+            self.dumper = None
+
+################################## GLOBAL STATE ###################################
+
+METRICS = Metrics()  # shared by the whole process
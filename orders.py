@@ -0,0 +1,242 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         orders.py                                                        #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Keep the queue of orders waiting to be fulfilled.                #
+#  Description:  An Order asks for a quantity of one item (SKU) to be brought to  #
+#                a destination. The OrderQueue keeps open orders in a priority    #
+#                queue (higher priority first, then first come first served),     #
+#                looks orders up by ID for status checks and cancellation, and    #
+#                remembers a bounded history of finished orders. The dispatcher   #
+#                that works through the queue is Warehouse.dispatch_orders.       #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+import heapq
+from collections import deque
+from itertools import islice
+from metrics import METRICS
+
+################################### CONSTANTS #####################################
+
+QUEUED = 'queued'          # waiting for robots
+ACTIVE = 'active'          # at least one pickup has been handed to a robot
+DONE = 'done'              # the whole quantity was delivered
+PARTIAL = 'partial'        # stopped after delivering only part of the quantity
+FAILED = 'failed'          # stopped without delivering anything
+CANCELLED = 'cancelled'    # cancelled by the caller
+
+OPEN = (QUEUED, ACTIVE)
+
+MAX_FAILED_PICKUPS = 3     # an order stops after this many pickups failed
+
+############################### CLASS DEFINITIONS #################################
+
+#===============================================================
+#  Class:       Order
+#  Attributes:
+#               order_id    : The ID returned to the caller by submit
+#               item_name   : The name (SKU) of the item to move
+#               quantity    : The quantity ordered
+#               destination : The destination coordinates
+#               priority    : Higher priorities are dispatched first
+#               status      : One of QUEUED, ACTIVE, DONE, PARTIAL, FAILED, CANCELLED
+#               delivered   : The quantity delivered so far
+#               in_flight   : The quantity currently being carried by robots
+#               failures    : The number of pickups that failed (blocked routes,
+#                             occupied destination, ...)
+#               stopping    : Set once the order must not start new pickups; it
+#                             closes when its last pickup comes back
+#               message     : The last status message of the order
+#               submitted   : The simulated time the order was submitted at, or None
+#                             if unknown (restored from an event log)
+#
+class Order:
+    def __init__(self, order_id, item_name, quantity, destination, priority=0):
+        self.order_id = order_id
+        self.item_name = item_name
+        self.quantity = quantity
+        self.destination = destination
+        self.priority = priority
+        self.status = QUEUED
+        self.delivered = 0
+        self.in_flight = 0
+        self.failures = 0
+        self.stopping = False
+        self.message = ''
+        self.submitted = None
+
+    @property
+    def is_open(self):
+        # Whether the order is still queued or being worked on
+        return self.status in OPEN
+
+    @property
+    def outstanding(self):
+        # The quantity neither delivered nor on its way
+        return self.quantity - self.delivered - self.in_flight
+
+    def close(self, status, message):
+        # Finish the order with the given status
+        self.status = status
+        self.stopping = True
+        self.message = message
+        METRICS.increment('orders_closed_total', status=status)
+
+    def snapshot(self):
+        """
+        Describe the order for status queries.
+
+        Returns:
+            dict: The order's ID, item, quantities, destination, priority,
+                status and last message.
+        """
+        return {
+            'order_id': self.order_id,
+            'item_name': self.item_name,
+            'quantity': self.quantity,
+            'destination': self.destination,
+            'priority': self.priority,
+            'status': self.status,
+            'delivered': self.delivered,
+            'in_flight': self.in_flight,
+            'message': self.message,
+        }
+
+#===============================================================
+#  Class:       OrderQueue
+#  Attributes:
+#               heap     : (-priority, order_id, order) entries of open orders;
+#                          closed orders are dropped lazily
+#               orders   : Order ID -> every open order and the most recent
+#                          finished ones
+#               finished : The IDs of the finished orders still in orders, oldest first
+#               history  : The number of finished orders kept for status queries
+#               version  : Bumped whenever the queue changes in a way that may
+#                          let the dispatcher make progress
+#               next_id  : The ID the next submitted order gets
+#
+class OrderQueue:
+    def __init__(self, history=10000):
+        self.heap = []
+        self.orders = {}
+        self.finished = deque()
+        self.history = history
+        self.version = 0
+        self.next_id = 1
+
+    def __len__(self):
+        # The number of open orders
+        return len(self.orders) - len(self.finished)
+
+    def submit(self, item_name, quantity, destination, priority=0):
+        """
+        Add an order to the queue.
+
+        Args:
+            item_name (str): The name of the item to move.
+            quantity (int): The quantity to move.
+            destination (tuple): The destination coordinates.
+            priority (int, optional): Higher priorities are served first. Defaults to 0.
+
+        Returns:
+            Order: The queued order.
+        """
+        order = Order(self.next_id, item_name, quantity, tuple(destination), priority)
+        self.restore(order)
+        METRICS.increment('orders_submitted_total')
+        return order
+
+    def restore(self, order):
+        """
+        Put an order back under its own ID (used when replaying an event log).
+
+        Args:
+            order (Order): The order, open or finished.
+
+        Returns:
+            None
+        """
+        self.orders[order.order_id] = order
+        self.next_id = max(self.next_id, order.order_id + 1)
+        if order.is_open:
+            heapq.heappush(self.heap, (-order.priority, order.order_id, order))
+            self.version += 1
+        else:
+            self.retire(order)
+
+    def get(self, order_id):
+        # The order with this ID, or None if it is unknown or long finished
+        return self.orders.get(order_id)
+
+    def cancel(self, order_id):
+        """
+        Cancel an open order. Pickups already handed to robots are completed,
+        but no new ones are started.
+
+        Args:
+            order_id (int): The ID returned by submit.
+
+        Returns:
+            bool: True if the order was open and is now cancelled.
+        """
+        order = self.orders.get(order_id)
+        if order is None or not order.is_open:
+            return False
+        order.close(CANCELLED, f"Order {order_id} cancelled after delivering {order.delivered}.")
+        self.retire(order)
+        return True
+
+    def retire(self, order):
+        """
+        Record that an order has closed, forgetting the oldest finished orders
+        once there are more than history of them.
+
+        Returns:
+            None
+        """
+        self.finished.append(order.order_id)
+        self.version += 1
+        while len(self.finished) > self.history:
+            del self.orders[self.finished.popleft()]
+
+    def open_orders(self, limit=None):
+        """
+        List the first open orders in dispatch order.
+
+        Args:
+            limit (int, optional): The most orders to list. Defaults to all of them.
+
+        Returns:
+            list: The open orders, highest priority (then oldest) first.
+        """
+        return list(islice(self.in_dispatch_order(), limit))
+
+    def in_dispatch_order(self):
+        """
+        Yield the open orders in dispatch order, dropping closed ones from the heap.
+
+        The heap is walked lazily: a small frontier heap holds the entries whose
+        parents were already yielded, so taking the first k orders costs
+        O(k log k) however many are queued. Orders may close while the caller
+        iterates (they are skipped), but none may be submitted.
+
+        Returns:
+            generator: The open orders, highest priority (then oldest) first.
+        """
+        while self.heap and not self.heap[0][2].is_open:
+            heapq.heappop(self.heap)
+        if len(self.heap) > 2 * len(self) + 64:
+            self.heap = [entry for entry in self.heap if entry[2].is_open]
+            heapq.heapify(self.heap)
+        heap = self.heap
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, index = heapq.heappop(frontier)
+            if entry[2].is_open:
+                yield entry[2]
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
@@ -6,124 +6,1682 @@
 #  Purpose:      Plan appropriate paths for the robots.                           #
 #  Description:  A class designed to model a path planning system in a warehouse  #
 #                grid. It uses the A* algorithm to determine the shortest path    #
-#                while avoiding obstacles. The grid is represented as a 2D matrix.#
+#                while avoiding obstacles. The grid is stored as a flat byte      #
+#                array indexed by cell id (x * width + y). Found routes can be    #
+#                kept in a PathCache that follows the shared occupancy map.       #
 ###################################################################################
 
 #################################### IMPORTS ######################################
 
+import hashlib
 import heapq
+import struct
+import time
+from array import array
+from collections import OrderedDict, deque
+from metrics import METRICS, Histogram, SECONDS_BUCKETS
+
+################################### CONSTANTS #####################################
+
+OCCUPIED = bytes([0] + [1] * 255)  # bytes.translate table: any count > 0 becomes 1
 
 ############################### CLASS DEFINITIONS #################################
 
+#===============================================================
+#  Class:       OccupancyMap
+#  Attributes:  length : The length (rows) of the warehouse grid.
+#               width  : The width (columns) of the warehouse grid.
+#               cells  : A bytearray with one entry per cell (index x * width + y)
+#                        counting how many items and robots stand on it.
+#               listeners : Callables invoked as listener(index, occupied) whenever
+#                           a cell turns from free to occupied or back.
+#
+#  One map is owned by the warehouse and kept up to date as items and robots
+#  are added, removed and moved, so planners can read it instead of rebuilding
+#  their own obstacle set.
+#
+class OccupancyMap:
+    def __init__(self, warehouse_length, warehouse_width):
+        self.length = warehouse_length
+        self.width = warehouse_width
+        self.cells = bytearray(warehouse_length * warehouse_width)
+        self.listeners = []
+
+    def add_listener(self, listener):
+        """Call listener(index, occupied) whenever a cell changes between free and occupied."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stop calling a listener registered with add_listener."""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def in_bounds(self, position):
+        """Check if a position lies within the grid."""
+        x, y = position
+        return 0 <= x < self.length and 0 <= y < self.width
+
+    def index(self, position):
+        """Convert a position into its cell id."""
+        return position[0] * self.width + position[1]
+
+    def add(self, position):
+        """Record one more item or robot at a position."""
+        if not self.in_bounds(position):
+            raise ValueError("Occupied position out of bounds.")
+        index = self.index(position)
+        self.cells[index] += 1
+        if self.cells[index] == 1:
+            for listener in self.listeners:
+                listener(index, True)
+
+    def add_many(self, indices):
+        """
+        Record one more item or robot at each of many cells at once.
+
+        Args:
+            indices (iterable): Cell ids (x * width + y), already checked to be
+                in bounds.
+
+        Returns:
+            None
+        """
+        cells = self.cells
+        newly_occupied = []
+        for index in indices:
+            if cells[index] == 0:
+                newly_occupied.append(index)
+            cells[index] += 1
+        for listener in self.listeners:
+            for index in newly_occupied:
+                listener(index, True)
+
+    def discard(self, position):
+        """Record that one item or robot has left a position."""
+        if self.in_bounds(position):
+            index = self.index(position)
+            if self.cells[index]:
+                self.cells[index] -= 1
+                if not self.cells[index]:
+                    for listener in self.listeners:
+                        listener(index, False)
+
+    def move(self, old_position, new_position):
+        """Record a robot stepping from one position to another."""
+        if old_position != new_position:
+            self.add(new_position)
+            self.discard(old_position)
+
+    def is_occupied(self, position):
+        """Check if any item or robot stands on a position."""
+        return self.in_bounds(position) and self.cells[self.index(position)] > 0
+
+    def clear(self):
+        """Forget every occupied position."""
+        occupied = [index for index, count in enumerate(self.cells) if count]
+        self.cells = bytearray(self.length * self.width)
+        for index in occupied:
+            for listener in self.listeners:
+                listener(index, False)
+
+#===============================================================
+#  Class:       CachedRoute
+#  Attributes:  key      : The (start, goal, passable) key the route is stored under.
+#               path     : The cell ids of the whole route as first planned.
+#               offset   : The index in path of the current start; the cells
+#                          before it have been cut off.
+#               passable : Cell ids the route may cross even when occupied.
+#
+class CachedRoute:
+    def __init__(self, key, path, passable):
+        self.key = key
+        self.path = path
+        self.offset = 0
+        self.passable = passable
+
+#===============================================================
+#  Class:       PathCache
+#  Attributes:  width   : The width (columns) of the warehouse grid.
+#               maxsize : The largest number of routes kept; the least
+#                         recently used one is evicted first.
+#               routes  : OrderedDict (start, goal, passable) -> CachedRoute,
+#                         in least to most recently used order.
+#               through : Cell id -> the routes crossing that cell (a dict used as an
+#                         ordered set, so routes are cut in a repeatable order).
+#               hits    : The number of lookups answered from the cache.
+#               misses  : The number of lookups that needed a search.
+#
+#  Sits in front of PathPlanner.find_path. Routes are dropped selectively:
+#  when a cell becomes occupied (blocked) only the routes crossing it are
+#  affected, and each of those keeps the part from the blocked cell onwards,
+#  re-keyed to start there. A robot stepping along its own route therefore
+#  finds the rest of it under its new position on the next lookup. Cells that
+#  become free do not invalidate anything, so a cached route stays collision
+#  free but may miss a shortcut opened after it was planned.
+#
+#  A cache must only be shared by planners with the same set_obstacle marks.
+#
+class PathCache:
+    def __init__(self, warehouse_width, maxsize=1024):
+        self.width = warehouse_width
+        self.maxsize = maxsize
+        self.routes = OrderedDict()
+        self.through = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.routes)
+
+    def get(self, start, goal, passable):
+        """
+        Look up a route.
+
+        Args:
+            start (tuple): The start position.
+            goal (tuple): The goal position.
+            passable (frozenset): The positions passed to find_path as passable.
+
+        Returns:
+            list: The cell ids from start to goal, or None on a miss.
+        """
+        route = self.routes.get((start, goal, passable))
+        if route is None:
+            self.misses += 1
+            return None
+        self.routes.move_to_end(route.key)
+        self.hits += 1
+        return route.path[route.offset:]
+
+    def put(self, start, goal, passable, path, passable_indices):
+        """
+        Store a route found by a search.
+
+        Args:
+            path (list): The cell ids from start to goal.
+            passable_indices (set): Cell ids the route may cross while occupied.
+        """
+        key = (start, goal, passable)
+        if key in self.routes:
+            self.discard(self.routes[key])
+        route = CachedRoute(key, path, passable_indices)
+        self.routes[key] = route
+        through = self.through
+        for index in path[1:]:
+            if index not in passable_indices:
+                through.setdefault(index, {})[route] = None
+        while len(self.routes) > self.maxsize:
+            self.discard(next(iter(self.routes.values())))
+
+    def discard(self, route, upto=None):
+        """Forget a route, or only unregister its cells up to path[upto] when cutting it there."""
+        through = self.through
+        stop = len(route.path) if upto is None else upto + 1
+        for index in route.path[route.offset + 1:stop]:
+            routes = through.get(index)
+            if routes is not None:
+                routes.pop(route, None)
+                if not routes:
+                    del through[index]
+        if upto is None and self.routes.get(route.key) is route:
+            del self.routes[route.key]
+
+    def cell_changed(self, index, occupied):
+        """
+        OccupancyMap listener. When a cell becomes occupied, every route
+        crossing it is cut so that it starts at that cell.
+        """
+        if not occupied:
+            return
+        for route in list(self.through.get(index, ())):
+            position = route.path.index(index, route.offset + 1)
+            if position == len(route.path) - 1:
+                self.discard(route)  # the goal itself is taken
+                continue
+            if self.routes.get(route.key) is route:
+                del self.routes[route.key]
+            self.discard(route, position)
+            route.offset = position
+            route.key = (divmod(index, self.width), *route.key[1:])
+            if route.key in self.routes:
+                self.discard(self.routes[route.key])
+            self.routes[route.key] = route
+
+    def clear(self):
+        """Forget every route."""
+        self.routes.clear()
+        self.through.clear()
+
+#===============================================================
+#  Class:       PlannerStats
+#  Attributes:
+#               rows : Algorithm -> [calls, failures, expansions, Histogram of the
+#                      seconds per call]
+#
+#  Counts every find_path call of the planners. It is updated on the hot path
+#  with plain integers and no lock (a rare lost update between threads only
+#  skews a statistic), and METRICS reads it through collect() when the
+#  metrics are read or dumped. The algorithms are 'astar', 'jps',
+#  'dstar_lite', 'hpa' and 'cooperative'.
+#
+class PlannerStats:
+    def __init__(self):
+        self.rows = {}
+
+    def run(self, algorithm, searcher, search, *args):
+        """
+        Run a search and count it.
+
+        Args:
+            algorithm (str): The label to count the search under.
+            searcher (object): The object whose expansions attribute the search sets.
+            search (callable): The search, called as search(*args).
+
+        Returns:
+            list: What the search returned (a path or None).
+        """
+        if not METRICS.enabled:
+            return search(*args)
+        started = time.perf_counter()
+        path = search(*args)
+        elapsed = time.perf_counter() - started
+        row = self.rows.get(algorithm)
+        if row is None:
+            row = self.rows[algorithm] = [0, 0, 0, Histogram(SECONDS_BUCKETS)]
+        row[0] += 1
+        if path is None:
+            row[1] += 1
+        row[2] += searcher.expansions
+        row[3].observe(elapsed)
+        return path
+
+    def collect(self):
+        # The counts as METRICS entries
+        for algorithm, (calls, failures, expansions, latency) in list(self.rows.items()):
+            labels = {'algorithm': algorithm}
+            yield 'counter', METRICS.key('planner_calls_total', labels), calls
+            yield 'counter', METRICS.key('planner_failures_total', labels), failures
+            yield 'counter', METRICS.key('planner_expansions_total', labels), expansions
+            yield 'histogram', METRICS.key('planner_latency_seconds', labels), latency
+
+    def reset(self):
+        # Forget every count
+        self.rows = {}
+
 #===============================================================
 #  Class:       Pathplanner
 #  Attributes:  length    : The length (rows) of the warehouse grid.
 #               width     : The width (columns) of the warehouse grid.
-#               grid      : A 2D list representing the grid, where 0 indicates 
-#                           a free space and 1 indicates an obstacle.
-#               obstacles : A set containing the positions of all obstacles.
+#               grid      : A flat bytearray with one entry per cell (index
+#                           x * width + y). A cell is an obstacle when its entry
+#                           equals the current generation, so clear_obstacle
+#                           only has to bump the generation.
+#               occupancy : An optional shared OccupancyMap; its occupied cells
+#                           are treated as obstacles too.
+#               passable  : Positions the current search may enter even if the
+#                           shared occupancy map marks them occupied.
+#               landmarks : An optional LandmarkHeuristic giving a tighter lower
+#                           bound than the Manhattan distance.
+#               cache     : An optional PathCache consulted before every search.
+#               algorithm : 'astar' (plain A*) or 'jps' (Jump Point Search, much
+#                           faster on large open floors; paths have the same length).
+#               hierarchy : The HierarchicalPlanner kept up to date with the marks,
+#                           once hierarchical() has been called.
 #
 class PathPlanner:
-    def __init__(self, warehouse_length, warehouse_width):
+    ALGORITHMS = ('astar', 'jps')
+
+    def __init__(self, warehouse_length, warehouse_width, occupancy=None, landmarks=None, cache=None,
+                 algorithm='astar'):
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown path planning algorithm: {algorithm}.")
         self.length = warehouse_length
         self.width = warehouse_width
-        self.grid = [[0 for _ in range(warehouse_width)] for _ in range(warehouse_length)]
-        self.obstacles = set()
+        self.grid = bytearray(warehouse_length * warehouse_width)
+        self.generation = 1
+        self.occupancy = occupancy
+        self.passable = set()
+        self.landmarks = landmarks
+        self.cache = cache
+        self.algorithm = algorithm
+        self.hierarchy = None
+        self.expansions = 0  # nodes expanded by the last find_path call
+
+    @property
+    def obstacles(self):
+        """The set of positions marked with set_obstacle (built on demand)."""
+        width, generation = self.width, self.generation
+        return {divmod(index, width) for index, mark in enumerate(self.grid) if mark == generation}
+
+    def index(self, position):
+        """Convert a position into its cell id."""
+        return position[0] * self.width + position[1]
+
+    def position(self, index):
+        """Convert a cell id back into a position."""
+        return divmod(index, self.width)
 
     def set_obstacle(self, position):
         """Mark a position as an obstacle."""
         x, y = position
         if 0 <= x < self.length and 0 <= y < self.width:
-            self.grid[x][y] = 1
-            self.obstacles.add(position)
+            self.grid[x * self.width + y] = self.generation
+            if self.cache is not None:
+                self.cache.cell_changed(x * self.width + y, True)
+            if self.hierarchy is not None:
+                self.hierarchy.cell_changed(position)
         else:
             raise ValueError("Obstacle position out of bounds.")
 
     def clear_obstacle(self):
-        """Clear all obstacles by setting all grid cells to 0."""
-        self.grid = [[0 for _ in range(self.width)] for _ in range(self.length)]
-        self.obstacles.clear()
+        """Clear all obstacles by starting a new generation of marks."""
+        self.generation += 1
+        if self.cache is not None:
+            self.cache.clear()
+        if self.hierarchy is not None:
+            self.hierarchy.reset()
+        if self.generation > 255:
+            # Stale marks could collide with a reused generation number, so
+            # wipe them once every 255 clears.
+            self.grid = bytearray(self.length * self.width)
+            self.generation = 1
 
     def is_valid(self, position):
         """Check if a position is valid (within bounds and not an obstacle)."""
         x, y = position
-        return 0 <= x < self.length and 0 <= y < self.width and self.grid[x][y] == 0
+        if not (0 <= x < self.length and 0 <= y < self.width):
+            return False
+        return self.is_free(x * self.width + y, self.passable_indices())
+
+    def is_free(self, index, passable_indices=()):
+        """Check if an in-bounds cell id is neither marked nor occupied."""
+        if self.grid[index] == self.generation:
+            return False
+        if self.occupancy is None or not self.occupancy.cells[index]:
+            return True
+        return index in passable_indices
+
+    def passable_indices(self):
+        """Cell ids of the in-bounds passable positions."""
+        return {x * self.width + y for x, y in self.passable if 0 <= x < self.length and 0 <= y < self.width}
 
     def heuristic(self, start, goal):
         """Manhattan distance heuristic for A*."""
         return abs(start[0] - goal[0]) + abs(start[1] - goal[1])
 
-    def find_path(self, start, goal):
+    def find_path(self, start, goal, passable=()):
         """
         Find the shortest path from start to goal using A* algorithm.
         Returns a list of tuples representing the path.
+
+        The start cell and any cells in passable are not blocked by the shared
+        occupancy map (the mover itself stands on start; passable typically
+        holds the item being fetched or the drop-off cell).
+
+        Every call is counted in PLANNER_STATS, with its expansions and its time.
         """
+        return PLANNER_STATS.run(self.algorithm, self, self.search, start, goal, passable)
+
+    def search(self, start, goal, passable=()):
+        # The search behind find_path
+        self.expansions = 0
+        self.passable = {start, *passable}
         if not self.is_valid(start) or not self.is_valid(goal):
             return None
             """
             raise ValueError("Start or goal position is invalid.")
             """
 
-        # Priority queue for the open set
-        open_set = []
-        heapq.heappush(open_set, (0, start, start))  # (f_cost, current, start)
+        if self.cache is not None:
+            key = frozenset(passable)
+            cached = self.cache.get(start, goal, key)
+            if cached is not None:
+                self.expansions = 0
+                return [divmod(index, self.width) for index in cached]
+
+        if self.algorithm == 'jps':
+            passable_indices = self.passable_indices()
+            path = self.jump_point_search(self.index(start), self.index(goal), passable_indices)
+            if path is None:
+                return None
+            if self.cache is not None:
+                self.cache.put(start, goal, key, path, passable_indices)
+            return [divmod(index, self.width) for index in path]
+
+        # The search runs on integer cell ids. Ordering the heap by (f, id) is
+        # the same as ordering by (f, (x, y)), so ties break exactly as they
+        # did when positions were tuples.
+        width = self.width
+        last_row = self.length - 1
+        last_column = width - 1
+        goal_x, goal_y = goal
+        start_index = self.index(start)
+        goal_index = self.index(goal)
+        grid, generation = self.grid, self.generation
+        cells = self.occupancy.cells if self.occupancy is not None else None
+        passable_indices = self.passable_indices()
+        heappush, heappop = heapq.heappush, heapq.heappop
+        estimate = None
+        if self.landmarks is not None:
+            estimate = self.landmarks.estimator(goal_index, passable_indices - {start_index, goal_index})
+
+        # Priority queue for the open set. A cell is queued again whenever a
+        # cheaper route to it is found; the outdated entry is skipped when it
+        # comes up, since the cell is already closed by then.
+        open_set = [(0, start_index)]  # (f_cost, cell id)
 
         # Dictionaries to track costs and path
-        g_cost = {start: 0}
+        g_cost = {start_index: 0}
         came_from = {}
         closed_set = set()
+        expansions = 0
 
         while open_set:
-            # Get the position with the lowest F-cost
-            _, current, original_start = heapq.heappop(open_set)
+            # Get the cell with the lowest F-cost
+            _, current = heappop(open_set)
+            if current in closed_set:
+                continue
 
             # If we reach the goal, reconstruct the path
-            if current == goal:
-                return self.reconstruct_path(came_from, current)
+            if current == goal_index:
+                self.expansions = expansions
+                path = self.trace(came_from, current)
+                if self.cache is not None:
+                    self.cache.put(start, goal, key, path, passable_indices)
+                return [divmod(index, width) for index in path]
 
             # Add current to closed set to avoid revisiting
             closed_set.add(current)
+            expansions += 1
 
-            # Explore neighbors
-            neighbors = self.get_neighbors(current)
-            for neighbor in neighbors:
-                # Skip if already evaluated
-                if neighbor in closed_set:
-                    continue
+            # Calculate tentative g cost
+            tentative_g_cost = g_cost[current] + 1  # Assuming uniform cost
 
-                # Calculate tentative g cost
-                tentative_g_cost = g_cost[current] + 1  # Assuming uniform cost
+            # Explore neighbors (up, down, left, right) by cell id
+            x, y = divmod(current, width)
+            for neighbor, nx, ny, inside in ((current - width, x - 1, y, x > 0),
+                                             (current + width, x + 1, y, x < last_row),
+                                             (current - 1, x, y - 1, y > 0),
+                                             (current + 1, x, y + 1, y < last_column)):
+                # Skip cells outside the grid, obstacles and already evaluated cells
+                if not inside or grid[neighbor] == generation or neighbor in closed_set:
+                    continue
+                if cells is not None and cells[neighbor] and neighbor not in passable_indices:
+                    continue
 
                 # Check if this is a better path
                 if neighbor not in g_cost or tentative_g_cost < g_cost[neighbor]:
                     # Update path and costs
                     came_from[neighbor] = current
                     g_cost[neighbor] = tentative_g_cost
-                    f_cost = tentative_g_cost + self.heuristic(neighbor, goal)
 
-                    # Add to open set if not already present
-                    if neighbor not in [pos for _, pos, _ in open_set]:
-                        heapq.heappush(open_set, (f_cost, neighbor, original_start))
+                    # Add to open set with the new cost
+                    f_cost = tentative_g_cost + abs(nx - goal_x) + abs(ny - goal_y)
+                    if estimate is not None and neighbor != goal_index:
+                        f_cost = max(f_cost, tentative_g_cost + estimate(neighbor))
+                    heappush(open_set, (f_cost, neighbor))
 
+        self.expansions = expansions
         # If the loop ends without returning, no path exists
         return None
 
+    def jump_point_search(self, start_index, goal_index, passable_indices):
+        """
+        Find a shortest path with Jump Point Search on the 4-connected grid.
+
+        Straight runs are scanned without queueing the cells along them; only
+        jump points (the goal, cells next to a wall corner where a turn may be
+        needed, and cells from which a perpendicular scan finds one) enter the
+        open set. Runs are scanned along a row first, so a column scan stops
+        wherever a row scan from it finds a jump point.
+
+        Args:
+            start_index (int): The start cell id.
+            goal_index (int): The goal cell id.
+            passable_indices (set): Cell ids that may be entered while occupied.
+
+        Returns:
+            list: The cell ids from start to goal, or None if there is no path.
+        """
+        width, length = self.width, self.length
+        blocked = self.blocked_cells(passable_indices)
+        goal_x, goal_y = divmod(goal_index, width)
+
+        def jump_row(x, y, dy):
+            # Scan along row x from column y in direction dy and return the first
+            # jump point. The run and the wall corners beside it are located with
+            # bytes searches instead of a Python loop over the cells.
+            row = x * width
+            above = row - width if x > 0 else None
+            below = row + width if x < length - 1 else None
+            if dy > 0:
+                stop = blocked.find(1, row + y, row + width)
+                end = stop - row if stop != -1 else width  # first column past the run
+                if end == y:
+                    return None
+                best = goal_y if x == goal_x and y <= goal_y < end else end
+                for side in (above, below):
+                    if side is not None:
+                        # A blocked cell followed by a free one beside the run
+                        corner = blocked.find(b'\x01\x00', side + y - 1, side + best)
+                        if corner != -1:
+                            best = corner + 1 - side
+                return row + best if best < end else None
+            stop = blocked.rfind(1, row, row + y + 1)
+            first = stop - row + 1 if stop != -1 else 0  # first column of the run
+            if first > y:
+                return None
+            best = goal_y if x == goal_x and first <= goal_y <= y else first - 1
+            for side in (above, below):
+                if side is not None:
+                    corner = blocked.rfind(b'\x00\x01', side + best + 1, side + y + 2)
+                    if corner != -1:
+                        best = corner - side
+            return row + best if best >= first else None
+
+        def jump_column(x, y, dx):
+            # Scan along column y in direction dx and return the first jump point
+            stride = dx * width
+            index = x * width + y
+            while 0 <= x < length and not blocked[index]:
+                if index == goal_index:
+                    return index
+                if ((y > 0 and not blocked[index - 1] and blocked[index - 1 - stride])
+                        or (y < width - 1 and not blocked[index + 1] and blocked[index + 1 - stride])):
+                    return index
+                if ((y < width - 1 and jump_row(x, y + 1, 1) is not None)
+                        or (y > 0 and jump_row(x, y - 1, -1) is not None)):
+                    return index
+                x += dx
+                index += stride
+            return None
+
+        heappush, heappop = heapq.heappush, heapq.heappop
+        open_set = [(0, start_index)]
+        g_cost = {start_index: 0}
+        came_from = {}
+        closed_set = set()
+        expansions = 0
+        while open_set:
+            _, current = heappop(open_set)
+            if current in closed_set:
+                continue
+            if current == goal_index:
+                self.expansions = expansions
+                path = [current]
+                while current in came_from:
+                    # Fill in the straight run back to the previous jump point
+                    previous = came_from[current]
+                    stride = 1 if previous // width == current // width else width
+                    if previous < current:
+                        stride = -stride
+                    path.extend(range(current + stride, previous + stride, stride))
+                    current = previous
+                path.reverse()
+                return path
+            closed_set.add(current)
+            expansions += 1
+
+            x, y = divmod(current, width)
+            parent = came_from.get(current)
+            if parent is None:
+                directions = ((-1, 0), (1, 0), (0, -1), (0, 1))
+            else:
+                px, py = divmod(parent, width)
+                dx = (x > px) - (x < px)
+                dy = (y > py) - (y < py)
+                # Never turn back; the run continues and both sides may open up.
+                directions = ((dx, 0), (0, -1), (0, 1)) if dx else ((0, dy), (-1, 0), (1, 0))
+            for dx, dy in directions:
+                if dy:
+                    point = jump_row(x, y + dy, dy) if 0 <= y + dy < width else None
+                else:
+                    point = jump_column(x + dx, y, dx)
+                if point is None or point in closed_set:
+                    continue
+                jx, jy = divmod(point, width)
+                tentative_g_cost = g_cost[current] + abs(jx - x) + abs(jy - y)
+                if tentative_g_cost < g_cost.get(point, tentative_g_cost + 1):
+                    g_cost[point] = tentative_g_cost
+                    came_from[point] = current
+                    heappush(open_set, (tentative_g_cost + abs(jx - goal_x) + abs(jy - goal_y), point))
+
+        self.expansions = expansions
+        return None
+
+    def blocked_cells(self, passable_indices=()):
+        """
+        Build a bytearray marking every cell that cannot be entered (1) right now.
+
+        The marks and the occupancy map are combined with whole-array byte
+        operations rather than cell by cell.
+
+        Args:
+            passable_indices (set): Cell ids that may be entered while occupied.
+
+        Returns:
+            bytearray: One byte per cell id.
+        """
+        size = self.length * self.width
+        marks = bytes(1 if value == self.generation else 0 for value in range(256))
+        blocked = self.grid.translate(marks)
+        if self.occupancy is not None:
+            occupied = self.occupancy.cells.translate(OCCUPIED)
+            blocked = (int.from_bytes(blocked, 'little') | int.from_bytes(occupied, 'little')).to_bytes(size, 'little')
+        blocked = bytearray(blocked)
+        grid, generation = self.grid, self.generation
+        for index in passable_indices:
+            blocked[index] = 1 if grid[index] == generation else 0
+        return blocked
+
+    def hierarchical(self, cluster_size=16):
+        """
+        Get the HPA* planner over this planner's marks, creating it on first use.
+
+        Later set_obstacle calls only mark the affected clusters for update.
+        The occupancy map is not seen, and routes are near-optimal rather than
+        shortest (see HierarchicalPlanner); used by benchmark.py.
+
+        Args:
+            cluster_size (int, optional): The side length of the clusters.
+
+        Returns:
+            HierarchicalPlanner: Call its find_path(start, goal) for long routes.
+        """
+        if self.hierarchy is None or self.hierarchy.cluster_size != cluster_size:
+            self.hierarchy = HierarchicalPlanner(self, cluster_size)
+        return self.hierarchy
+
+    def incremental(self, goal, passable=()):
+        """
+        Start an incremental (D* Lite) search towards goal.
+
+        Unlike find_path, the returned search keeps its state between calls
+        and only repairs what changed in the occupancy map since the last one,
+        which is much cheaper for a robot replanning after every step.
+
+        Returns:
+            DStarLite: Call its find_path(start) for each step and close() at the end.
+        """
+        return DStarLite(self, goal, passable)
+
+    def neighbor_indices(self, index, passable_indices=()):
+        """Return the free neighbouring cell ids (up, down, left, right)."""
+        width = self.width
+        x, y = divmod(index, width)
+        grid, generation = self.grid, self.generation
+        cells = self.occupancy.cells if self.occupancy is not None else None
+        neighbors = []
+        for neighbor, inside in ((index - width, x > 0),                 # Up
+                                 (index + width, x < self.length - 1),   # Down
+                                 (index - 1, y > 0),                     # Left
+                                 (index + 1, y < width - 1)):            # Right
+            if not inside or grid[neighbor] == generation:
+                continue
+            if cells is not None and cells[neighbor] and neighbor not in passable_indices:
+                continue
+            neighbors.append(neighbor)
+        return neighbors
+
     def get_neighbors(self, position):
         """Return valid neighboring positions (up, down, left, right)."""
-        x, y = position
-        potential_neighbors = [
-            (x - 1, y),  # Up
-            (x + 1, y),  # Down
-            (x, y - 1),  # Left
-            (x, y + 1),  # Right
-        ]
-        return [n for n in potential_neighbors if self.is_valid(n)]
+        return [self.position(n) for n in self.neighbor_indices(self.index(position), self.passable_indices())]
 
-    def reconstruct_path(self, came_from, current):
-        """Reconstruct the path from start to goal."""
+    def trace(self, came_from, current):
+        """Follow came_from back to the start and return the cell ids in order."""
         path = [current]
         while current in came_from:
             current = came_from[current]
             path.append(current)
         path.reverse()
-        return path
\ No newline at end of file
+        return path
+
+    def reconstruct_path(self, came_from, current):
+        """Reconstruct the path of positions from start to goal cell ids."""
+        width = self.width
+        return [divmod(index, width) for index in self.trace(came_from, current)]
+
+#===============================================================
+#  Class:       DStarLite
+#  Attributes:  planner   : The PathPlanner whose obstacles and occupancy map are used.
+#               goal      : The goal cell id.
+#               passable  : Cell ids that may be entered even if occupied.
+#               start     : The cell id the last path was planned from.
+#               g, rhs    : The D* Lite cost estimates (cell id -> distance to goal).
+#               queue     : The priority queue of inconsistent cells, as a heap
+#                           of (key, cell id) with stale entries skipped.
+#               queued    : Cell id -> its current key in the queue.
+#               km        : The key modifier accumulated as the start moves.
+#               changed   : Cell ids whose occupancy changed since the last plan.
+#               adjacent  : Cell id -> its in-bounds neighbours (filled on demand).
+#               path      : The cell ids of the last route returned.
+#               expansions: Cells expanded by the last find_path call.
+#
+#  Incremental replanning for one mover heading to one goal. The search runs
+#  backwards from the goal, so when the mover steps forward and a few cells
+#  change (another robot moved), only the estimates those cells affect are
+#  repaired instead of searching the whole floor again. It listens to the
+#  planner's occupancy map; call close() when done so it stops listening.
+#  Marks made with set_obstacle afterwards are not seen unless reported
+#  with mark_changed.
+#
+class DStarLite:
+    INFINITY = float('inf')
+
+    def __init__(self, planner, goal, passable=()):
+        self.planner = planner
+        self.goal = planner.index(goal)
+        self.passable = {planner.index(position) for position in passable
+                         if 0 <= position[0] < planner.length and 0 <= position[1] < planner.width}
+        self.start = None
+        self.g = {}
+        self.rhs = {self.goal: 0}
+        self.queue = []
+        self.queued = {}
+        self.km = 0
+        self.changed = set()
+        self.adjacent = {}
+        self.path = None
+        self.expansions = 0
+        if planner.occupancy is not None:
+            planner.occupancy.add_listener(self.cell_changed)
+
+    def close(self):
+        """Stop following the occupancy map."""
+        if self.planner.occupancy is not None:
+            self.planner.occupancy.remove_listener(self.cell_changed)
+
+    def cell_changed(self, index, occupied):
+        # OccupancyMap listener: remember the cell for the next repair.
+        self.changed.add(index)
+
+    def mark_changed(self, position):
+        """Report a cell whose set_obstacle mark changed."""
+        self.changed.add(self.planner.index(position))
+
+    def heuristic(self, index):
+        # Manhattan distance from the current start
+        width = self.planner.width
+        return abs(index // width - self.start // width) + abs(index % width - self.start % width)
+
+    def key(self, index):
+        # Queue priority of a cell
+        best = min(self.g.get(index, self.INFINITY), self.rhs.get(index, self.INFINITY))
+        return (best + self.heuristic(index) + self.km, best)
+
+    def is_free(self, index):
+        # Whether a cell may be stood on right now
+        planner = self.planner
+        if planner.grid[index] == planner.generation:
+            return False
+        cells = planner.occupancy.cells if planner.occupancy is not None else None
+        return not (cells and cells[index]) or index == self.start or index in self.passable
+
+    def neighbors(self, index):
+        # The in-bounds neighbouring cell ids (up, down, left, right), cached per cell
+        neighbors = self.adjacent.get(index)
+        if neighbors is None:
+            width = self.planner.width
+            x, y = divmod(index, width)
+            neighbors = self.adjacent[index] = tuple(
+                neighbor for neighbor, inside in ((index - width, x > 0),
+                                                  (index + width, x < self.planner.length - 1),
+                                                  (index - 1, y > 0),
+                                                  (index + 1, y < width - 1)) if inside)
+        return neighbors
+
+    def update(self, index):
+        # Recompute rhs of a cell from its neighbours and requeue it if inconsistent
+        g, rhs, infinity = self.g, self.rhs, self.INFINITY
+        if index != self.goal:
+            best = infinity
+            planner = self.planner
+            grid, generation = planner.grid, planner.generation
+            cells = planner.occupancy.cells if planner.occupancy is not None else None
+            start, passable = self.start, self.passable
+            if grid[index] != generation and (not cells or not cells[index] or index == start or index in passable):
+                for neighbor in self.neighbors(index):
+                    cost = g.get(neighbor, infinity) + 1
+                    if (cost < best and grid[neighbor] != generation
+                            and (not cells or not cells[neighbor] or neighbor == start or neighbor in passable)):
+                        best = cost
+            if best == infinity:
+                rhs.pop(index, None)
+            else:
+                rhs[index] = best
+        queued = self.queued
+        queued.pop(index, None)
+        distance = g.get(index, infinity)
+        estimate = rhs.get(index, infinity)
+        if distance != estimate:
+            best = distance if distance < estimate else estimate
+            width, start = self.planner.width, self.start
+            key = (best + abs(index // width - start // width) + abs(index % width - start % width) + self.km, best)
+            queued[index] = key
+            heapq.heappush(self.queue, (key, index))
+
+    def compute(self):
+        # Expand inconsistent cells until the start is consistent
+        g, rhs, queue, queued = self.g, self.rhs, self.queue, self.queued
+        infinity = self.INFINITY
+        start = self.start
+        update, neighbors = self.update, self.neighbors
+        heappop, heappush = heapq.heappop, heapq.heappush
+        expansions = 0
+        while queue:
+            key, index = queue[0]
+            if queued.get(index) != key:
+                heappop(queue)  # stale entry
+                continue
+            if key >= self.key(start) and rhs.get(start, infinity) == g.get(start, infinity):
+                break
+            heappop(queue)
+            expansions += 1
+            new_key = self.key(index)
+            if key < new_key:
+                queued[index] = new_key
+                heappush(queue, (new_key, index))
+                continue
+            del queued[index]
+            if g.get(index, infinity) > rhs.get(index, infinity):
+                g[index] = rhs[index]
+            else:
+                g.pop(index, None)
+                update(index)
+            for neighbor in neighbors(index):
+                update(neighbor)
+        self.expansions = expansions
+
+    def find_path(self, start):
+        """
+        Plan (or repair) the route from start to the goal.
+
+        Args:
+            start (tuple): The current position of the mover.
+
+        Returns:
+            list: The positions from start to goal, or None if there is no route.
+
+        Every call is counted in PLANNER_STATS.
+        """
+        return PLANNER_STATS.run('dstar_lite', self, self.search, start)
+
+    def search(self, start):
+        # The search behind find_path
+        planner = self.planner
+        width = planner.width
+        start = planner.index(start)
+        if self.start is None:
+            self.start = start
+            self.update(self.goal)
+        elif start != self.start:
+            self.changed.update((self.start, start))  # the mover's own cell is passable
+            self.km += abs(start // width - self.start // width) + abs(start % width - self.start % width)
+            self.start = start
+        changed, self.changed = self.changed, set()
+        update, neighbors = self.update, self.neighbors
+        for index in changed:
+            update(index)
+            for neighbor in neighbors(index):
+                update(neighbor)
+        self.compute()
+
+        cost = self.g.get(start, self.INFINITY)
+        if not self.is_free(self.goal) or cost == self.INFINITY:
+            self.path = None
+            return None
+
+        # Keep the rest of the previous route while it is still free and as
+        # short as the repaired estimate says the best route is.
+        is_free = self.is_free
+        path = self.path
+        if path is not None and start in path:
+            path = path[path.index(start):]
+            if len(path) - 1 == cost and all(is_free(index) for index in path):
+                self.path = path
+                return [divmod(index, width) for index in path]
+
+        g, infinity = self.g, self.INFINITY
+        path = [start]
+        current = start
+        for _ in range(cost):
+            # Follow the neighbour with the lowest cost to go
+            best = infinity
+            for neighbor in neighbors(current):
+                distance = g.get(neighbor, infinity)
+                if distance < best and is_free(neighbor):
+                    best, current = distance, neighbor
+            path.append(current)
+            if current == self.goal:
+                break
+        if current != self.goal:
+            # Estimates off the optimal route may still be stale; fall back to A*.
+            self.path = None
+            return planner.find_path(divmod(start, width), divmod(self.goal, width),
+                                     [divmod(index, width) for index in self.passable])
+        self.path = path
+        return [divmod(index, width) for index in path]
+
+#===============================================================
+#  Class:       HierarchicalPlanner
+#  Attributes:  planner      : The PathPlanner whose set_obstacle marks are planned over.
+#               cluster_size : The side length of the square clusters (zones).
+#               clusters     : The number of cluster rows and columns.
+#               transitions  : Border key -> the (cell, cell) pairs where a route may
+#                              cross that border between two neighbouring clusters.
+#               links        : Cell id -> the cells across a border it connects to.
+#               edges        : Cluster -> {entrance: {entrance: walking distance}}
+#                              inside the cluster.
+#               dirty_borders  : Borders whose transitions must be recomputed.
+#               dirty_clusters : Clusters whose inner distances must be recomputed.
+#               expansions   : Abstract nodes expanded by the last find_path call.
+#
+#  HPA*: the grid is split into clusters, and the places where a route can
+#  cross between neighbouring clusters become the nodes of a small abstract
+#  graph, with the walking distances inside each cluster precomputed. A query
+#  connects start and goal to the entrances of their clusters, searches the
+#  abstract graph, and refines each abstract step with a search confined to
+#  one cluster, so the cost follows the route rather than the floor area.
+#  set_obstacle only marks the cluster it touches (and a border, if on one)
+#  for recomputation.
+#
+#  For benchmarks only (benchmark.py); Warehouse never uses it. It plans over
+#  the static layout, i.e. the planner's own marks, and ignores the shared
+#  occupancy map, so it cannot steer around robots. Routes are near-optimal,
+#  not shortest: on random floors with 20% marked cells about one route in
+#  six is longer than A*'s, by 8% on average and up to twice as long for
+#  short routes that leave their cluster.
+#
+class HierarchicalPlanner:
+    MIN_SPLIT = 6  # entrances at least this wide get a transition at each end
+
+    def __init__(self, planner, cluster_size=16):
+        self.planner = planner
+        self.cluster_size = cluster_size
+        self.clusters = (-(-planner.length // cluster_size), -(-planner.width // cluster_size))
+        self.transitions = {}
+        self.links = {}
+        self.edges = {}
+        self.dirty_borders = set()
+        self.dirty_clusters = set()
+        self.expansions = 0
+        self.reset()
+
+    def reset(self):
+        """Mark every border and cluster for recomputation."""
+        rows, columns = self.clusters
+        self.dirty_clusters = {(cx, cy) for cx in range(rows) for cy in range(columns)}
+        self.dirty_borders = set()
+        for cx, cy in self.dirty_clusters:
+            if cy + 1 < columns:
+                self.dirty_borders.add(('row', cx, cy))
+            if cx + 1 < rows:
+                self.dirty_borders.add(('column', cx, cy))
+
+    def cluster_of(self, index):
+        # The cluster containing a cell id
+        x, y = divmod(index, self.planner.width)
+        return (x // self.cluster_size, y // self.cluster_size)
+
+    def bounds(self, cluster):
+        # The rows and columns covered by a cluster
+        cx, cy = cluster
+        size = self.cluster_size
+        return (cx * size, min((cx + 1) * size, self.planner.length),
+                cy * size, min((cy + 1) * size, self.planner.width))
+
+    def cell_changed(self, position):
+        """Record that a cell's mark changed (called by PathPlanner.set_obstacle)."""
+        x, y = position
+        size = self.cluster_size
+        cx, cy = x // size, y // size
+        self.dirty_clusters.add((cx, cy))
+        # A cell on the edge of a cluster may open or close an entrance.
+        rows, columns = self.clusters
+        if y % size == size - 1 and cy + 1 < columns:
+            self.dirty_borders.add(('row', cx, cy))
+        if y % size == 0 and cy > 0:
+            self.dirty_borders.add(('row', cx, cy - 1))
+        if x % size == size - 1 and cx + 1 < rows:
+            self.dirty_borders.add(('column', cx, cy))
+        if x % size == 0 and cx > 0:
+            self.dirty_borders.add(('column', cx - 1, cy))
+
+    def is_open(self, index):
+        # Whether a cell carries no set_obstacle mark
+        return self.planner.grid[index] != self.planner.generation
+
+    def build_border(self, border):
+        # Find the transitions across one border and link their cells
+        kind, cx, cy = border
+        width = self.planner.width
+        first_row, last_row, first_column, last_column = self.bounds((cx, cy))
+        if kind == 'row':
+            # Between (cx, cy) and (cx, cy + 1): cells in the last column of one
+            # and the first column of the other, walking down the rows.
+            pairs = [(x * width + last_column - 1, x * width + last_column) for x in range(first_row, last_row)]
+            other = (cx, cy + 1)
+        else:
+            pairs = [((last_row - 1) * width + y, last_row * width + y) for y in range(first_column, last_column)]
+            other = (cx + 1, cy)
+
+        for a, b in self.transitions.pop(border, ()):
+            self.unlink(a, b)
+        transitions = []
+        run = []
+        for a, b in pairs + [(None, None)]:
+            if a is not None and self.is_open(a) and self.is_open(b):
+                run.append((a, b))
+                continue
+            if run:
+                if len(run) >= self.MIN_SPLIT:
+                    transitions += [run[0], run[-1]]
+                else:
+                    transitions.append(run[len(run) // 2])
+                run = []
+        for a, b in transitions:
+            self.links.setdefault(a, set()).add(b)
+            self.links.setdefault(b, set()).add(a)
+        self.transitions[border] = transitions
+        self.dirty_clusters.update(((cx, cy), other))
+
+    def unlink(self, a, b):
+        # Remove the link between the two cells of a transition
+        for cell, partner in ((a, b), (b, a)):
+            partners = self.links.get(cell)
+            if partners is not None:
+                partners.discard(partner)
+                if not partners:
+                    del self.links[cell]
+
+    def entrances(self, cluster):
+        # The transition cells lying inside a cluster
+        first_row, last_row, first_column, last_column = self.bounds(cluster)
+        width = self.planner.width
+        cx, cy = cluster
+        cells = set()
+        for border in (('row', cx, cy), ('row', cx, cy - 1), ('column', cx, cy), ('column', cx - 1, cy)):
+            for pair in self.transitions.get(border, ()):
+                for cell in pair:
+                    x, y = divmod(cell, width)
+                    if first_row <= x < last_row and first_column <= y < last_column:
+                        cells.add(cell)
+        return cells
+
+    def local_distances(self, source, bounds, targets=None):
+        # Breadth-first search confined to bounds; returns (distance, came_from)
+        first_row, last_row, first_column, last_column = bounds
+        width = self.planner.width
+        grid, generation = self.planner.grid, self.planner.generation
+        distance = {source: 0}
+        came_from = {}
+        queue = deque([source])
+        remaining = set(targets) if targets is not None else None
+        while queue:
+            current = queue.popleft()
+            if remaining is not None:
+                remaining.discard(current)
+                if not remaining:
+                    break
+            x, y = divmod(current, width)
+            for neighbor, inside in ((current - width, x > first_row),
+                                     (current + width, x < last_row - 1),
+                                     (current - 1, y > first_column),
+                                     (current + 1, y < last_column - 1)):
+                if inside and neighbor not in distance and grid[neighbor] != generation:
+                    distance[neighbor] = distance[current] + 1
+                    came_from[neighbor] = current
+                    queue.append(neighbor)
+        return distance, came_from
+
+    def build_cluster(self, cluster):
+        # Precompute the walking distances between the entrances of a cluster
+        entrances = self.entrances(cluster)
+        edges = {}
+        for entrance in entrances:
+            distance, _ = self.local_distances(entrance, self.bounds(cluster), entrances)
+            edges[entrance] = {other: distance[other] for other in entrances
+                               if other != entrance and other in distance}
+        self.edges[cluster] = edges
+
+    def refresh(self):
+        """Recompute the borders and clusters touched since the last query."""
+        for border in sorted(self.dirty_borders):
+            self.build_border(border)
+        self.dirty_borders.clear()
+        for cluster in self.dirty_clusters:
+            self.build_cluster(cluster)
+        self.dirty_clusters.clear()
+
+    def find_path(self, start, goal):
+        """
+        Find a route from start to goal through the cluster graph.
+
+        Args:
+            start (tuple): The start position.
+            goal (tuple): The goal position.
+
+        Returns:
+            list: The positions from start to goal, or None if there is no route.
+
+        Every call is counted in PLANNER_STATS.
+        """
+        return PLANNER_STATS.run('hpa', self, self.search, start, goal)
+
+    def search(self, start, goal):
+        # The search behind find_path
+        planner = self.planner
+        width = planner.width
+        if not (0 <= start[0] < planner.length and 0 <= start[1] < width
+                and 0 <= goal[0] < planner.length and 0 <= goal[1] < width):
+            return None
+        start, goal = planner.index(start), planner.index(goal)
+        if not self.is_open(start) or not self.is_open(goal):
+            return None
+        self.refresh()
+
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+        if abs(start_cluster[0] - goal_cluster[0]) <= 1 and abs(start_cluster[1] - goal_cluster[1]) <= 1:
+            # Close by: a direct search over the two clusters avoids detours
+            # through entrances that may lie far from the short way across.
+            first, second = self.bounds(start_cluster), self.bounds(goal_cluster)
+            bounds = (min(first[0], second[0]), max(first[1], second[1]),
+                      min(first[2], second[2]), max(first[3], second[3]))
+            _, parents = self.local_distances(start, bounds, (goal,))
+            if goal in parents or goal == start:
+                path = [goal]
+                while path[-1] != start:
+                    path.append(parents[path[-1]])
+                self.expansions = 0
+                return [divmod(index, width) for index in reversed(path)]
+
+        # Connect start and goal to the entrances of their own clusters.
+        start_edges = {}
+        distance, _ = self.local_distances(start, self.bounds(start_cluster))
+        for entrance in self.edges[start_cluster]:
+            if entrance in distance:
+                start_edges[entrance] = distance[entrance]
+        if goal_cluster == start_cluster and goal in distance:
+            start_edges[goal] = distance[goal]
+        goal_edges = {}
+        distance, _ = self.local_distances(goal, self.bounds(goal_cluster))
+        for entrance in self.edges[goal_cluster]:
+            if entrance in distance:
+                goal_edges[entrance] = distance[entrance]
+
+        # A* over the abstract graph
+        goal_x, goal_y = divmod(goal, width)
+        open_set = [(0, start)]
+        g_cost = {start: 0}
+        came_from = {}
+        closed = set()
+        expansions = 0
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            if current == goal:
+                break
+            closed.add(current)
+            expansions += 1
+            if current == start:
+                steps = list(start_edges.items())
+            else:
+                steps = list(self.edges[self.cluster_of(current)].get(current, {}).items())
+                if current in goal_edges:
+                    steps.append((goal, goal_edges[current]))
+            steps += [(partner, 1) for partner in self.links.get(current, ())]
+            for neighbor, cost in steps:
+                tentative_g_cost = g_cost[current] + cost
+                if neighbor not in closed and tentative_g_cost < g_cost.get(neighbor, tentative_g_cost + 1):
+                    g_cost[neighbor] = tentative_g_cost
+                    came_from[neighbor] = current
+                    x, y = divmod(neighbor, width)
+                    heapq.heappush(open_set, (tentative_g_cost + abs(x - goal_x) + abs(y - goal_y), neighbor))
+        self.expansions = expansions
+        if goal not in g_cost:
+            return None
+
+        abstract = [goal]
+        while abstract[-1] in came_from:
+            abstract.append(came_from[abstract[-1]])
+        abstract.reverse()
+
+        # Refine every abstract step inside its cluster.
+        path = [start]
+        for previous, current in zip(abstract, abstract[1:]):
+            cluster = self.cluster_of(previous)
+            if cluster != self.cluster_of(current):
+                path.append(current)  # one step across a border
+                continue
+            _, parents = self.local_distances(previous, self.bounds(cluster), (current,))
+            segment = [current]
+            while segment[-1] != previous:
+                segment.append(parents[segment[-1]])
+            path.extend(reversed(segment[:-1]))
+        return [divmod(index, width) for index in path]
+
+#===============================================================
+#  Class:       ReservationTable
+#  Attributes:  cells : Cell id -> {tick: the agent that will stand there then}
+#               holds : Cell id -> (agent, tick) for agents that stay on a cell
+#                       from that tick on (their goal, or where they are stuck)
+#               owned : Agent -> the keys of cells and holds it reserved
+#
+#  The space-time reservation table shared by every CooperativeSearch. An
+#  agent with reservations is "active": its current cell is not a static
+#  obstacle for the others, who plan around its reservations instead.
+#
+class ReservationTable:
+    def __init__(self):
+        self.cells = {}
+        self.holds = {}
+        self.owned = {}
+
+    def is_active(self, agent):
+        """Check whether an agent currently has reservations."""
+        return agent in self.owned
+
+    def owner(self, cell, tick):
+        """Return the agent standing on a cell at a tick, or None."""
+        ticks = self.cells.get(cell)
+        agent = ticks.get(tick) if ticks is not None else None
+        if agent is not None:
+            return agent
+        hold = self.holds.get(cell)
+        if hold is not None and hold[1] <= tick:
+            return hold[0]
+        return None
+
+    def reserve(self, agent, cell, first_tick, last_tick):
+        """Reserve a cell for an agent from first_tick to last_tick (inclusive)."""
+        keys = self.owned.setdefault(agent, [])
+        ticks = self.cells.setdefault(cell, {})
+        for tick in range(first_tick, last_tick + 1):
+            ticks[tick] = agent
+            keys.append((cell, tick))
+
+    def hold(self, agent, cell, tick):
+        """Reserve a cell for an agent from a tick on, until it is released."""
+        self.holds[cell] = (agent, tick)
+        self.owned.setdefault(agent, []).append(cell)
+
+    def release(self, agent):
+        """Drop every reservation of an agent."""
+        for key in self.owned.pop(agent, ()):
+            if isinstance(key, tuple):
+                cell, tick = key
+                ticks = self.cells.get(cell)
+                if ticks is not None and ticks.get(tick) is agent:
+                    del ticks[tick]
+                    if not ticks:
+                        del self.cells[cell]
+            elif self.holds.get(key, (None,))[0] is agent:
+                del self.holds[key]
+
+#===============================================================
+#  Class:       CooperativeSearch
+#  Attributes:  planner      : The PathPlanner whose obstacles and occupancy map are used.
+#               agent        : The robot the search plans for.
+#               goal         : The goal cell id.
+#               passable     : Cell ids that may be entered even if occupied.
+#               reservations : The shared ReservationTable.
+#               clock        : The simulation clock (its tick is "now").
+#               ticks        : The number of ticks the agent needs per cell.
+#               occupant     : Callable position -> robot standing there (or None).
+#               window       : The number of steps planned in space-time.
+#               distance     : Cell id -> walking distance to goal ignoring other
+#                              moving robots (the heuristic), or None.
+#               expansions   : Space-time states expanded by the last find_path call.
+#
+#  Windowed cooperative A*: every call plans the next `window` steps (moves or
+#  waits) of one robot in space and time, avoiding the cells and swaps that
+#  other active robots reserved, then reserves its own plan. The rest of the
+#  route beyond the window follows the distance table. Robots that are not
+#  travelling (parked, or items) stay ordinary obstacles.
+#
+class CooperativeSearch:
+    def __init__(self, planner, agent, goal, passable, reservations, clock, ticks, occupant, window=16):
+        self.planner = planner
+        self.agent = agent
+        self.goal = planner.index(goal)
+        self.passable = {planner.index(position) for position in passable
+                         if 0 <= position[0] < planner.length and 0 <= position[1] < planner.width}
+        self.reservations = reservations
+        self.clock = clock
+        self.ticks = ticks
+        self.occupant = occupant
+        self.window = window
+        self.distance = None
+        self.expansions = 0
+
+    def close(self):
+        """Drop the agent's reservations (it becomes an ordinary obstacle again)."""
+        self.reservations.release(self.agent)
+
+    def is_static_free(self, index, start):
+        # Whether a cell is free of marks, items and robots that are not travelling
+        planner = self.planner
+        if planner.grid[index] == planner.generation:
+            return False
+        if index == start or index in self.passable or planner.occupancy is None:
+            return True
+        count = planner.occupancy.cells[index]
+        if count:
+            robot = self.occupant(divmod(index, planner.width))
+            if robot is not None and self.reservations.is_active(robot):
+                count -= 1
+        return not count
+
+    def build_distance(self, start):
+        # Walking distance to goal over the static obstacles (breadth-first search)
+        distance = {self.goal: 0}
+        queue = deque([self.goal])
+        while queue:
+            current = queue.popleft()
+            step = distance[current] + 1
+            for neighbor in self.neighbors(current):
+                if neighbor not in distance and self.is_static_free(neighbor, start):
+                    distance[neighbor] = step
+                    queue.append(neighbor)
+        self.distance = distance
+
+    def neighbors(self, index):
+        # The in-bounds neighbouring cell ids (up, down, left, right)
+        width = self.planner.width
+        x, y = divmod(index, width)
+        return [neighbor for neighbor, inside in ((index - width, x > 0),
+                                                  (index + width, x < self.planner.length - 1),
+                                                  (index - 1, y > 0),
+                                                  (index + 1, y < width - 1)) if inside]
+
+    def is_open(self, cell, first_tick, last_tick):
+        # Whether no other agent reserved the cell during the ticks
+        owner, agent = self.reservations.owner, self.agent
+        for tick in range(first_tick, last_tick + 1):
+            other = owner(cell, tick)
+            if other is not None and other is not agent:
+                return False
+        return True
+
+    def find_path(self, start):
+        """
+        Plan the next steps from start, reserve them, and return the route.
+
+        Args:
+            start (tuple): The current position of the agent.
+
+        Returns:
+            list: The positions from start to goal, one per step; a position
+            repeated means waiting there for a step. None if there is no route.
+
+        Every call is counted in PLANNER_STATS.
+        """
+        return PLANNER_STATS.run('cooperative', self, self.search, start)
+
+    def search(self, start):
+        # The search behind find_path
+        planner, reservations, agent = self.planner, self.reservations, self.agent
+        width = planner.width
+        start = planner.index(start)
+        now, ticks, window, goal = self.clock.tick, self.ticks, self.window, self.goal
+        reservations.release(agent)
+
+        if self.distance is None or start not in self.distance:
+            self.build_distance(start)
+        distance = self.distance
+        if start not in distance or not self.is_static_free(goal, start):
+            reservations.hold(agent, start, now)
+            return None
+
+        # Space-time A* over (cell, step). Step i >= 1 stands on its cell during
+        # ticks now + (i - 1) * ticks ... now + i * ticks - 1. Ties prefer the
+        # deeper state so the search heads for the window edge.
+        owner = reservations.owner
+        open_set = [(distance[start], 0, start)]
+        came_from = {}
+        closed = set()
+        expansions = 0
+        end = None
+        while open_set:
+            _, depth, cell = heapq.heappop(open_set)
+            step = -depth
+            if (cell, step) in closed:
+                continue
+            closed.add((cell, step))
+            if step == window or cell == goal:
+                end = (cell, step)
+                break
+            expansions += 1
+            first = now + step * ticks
+            last = first + ticks - 1
+            for neighbor in [cell] + self.neighbors(cell):
+                if neighbor not in distance or (neighbor, step + 1) in closed:
+                    continue
+                if not self.is_static_free(neighbor, start) or not self.is_open(neighbor, first, last):
+                    continue
+                if neighbor != cell:
+                    # Two robots swapping cells is never granted.
+                    other = owner(neighbor, first - 1)
+                    if other is not None and other is not agent and owner(cell, first) is other:
+                        continue
+                came_from[(neighbor, step + 1)] = (cell, step)
+                heapq.heappush(open_set, (step + 1 + distance[neighbor], -(step + 1), neighbor))
+        self.expansions = expansions
+        if end is None:
+            reservations.hold(agent, start, now)
+            return None
+
+        states = [end]
+        while states[-1] in came_from:
+            states.append(came_from[states[-1]])
+        states.reverse()
+        for cell, step in states[1:]:
+            reservations.reserve(agent, cell, now + (step - 1) * ticks, now + step * ticks - 1)
+        last_cell, last_step = states[-1]
+        if last_cell == goal:
+            reservations.hold(agent, goal, now + last_step * ticks)
+
+        # Beyond the window, follow the distance table down to the goal.
+        path = [cell for cell, _ in states]
+        current = last_cell
+        while current != goal:
+            current = min((neighbor for neighbor in self.neighbors(current) if neighbor in distance),
+                          key=distance.get)
+            path.append(current)
+        return [divmod(index, width) for index in path]
+
+#===============================================================
+#  Class:       LandmarkHeuristic
+#  Attributes:  length    : The length (rows) of the warehouse grid.
+#               width     : The width (columns) of the warehouse grid.
+#               blocked   : A bytearray marking the static layout (1 = storage
+#                           slot or racking) the distances were computed on.
+#               landmarks : The cell ids of the landmarks.
+#               distances : One array('I') per landmark with the true walking
+#                           distance from the landmark to every cell.
+#
+#  ALT heuristic: by the triangle inequality, |d(L, goal) - d(L, n)| is a lower
+#  bound on the distance from n to goal for every landmark L. Along aisles this
+#  is much tighter than the Manhattan distance, so A* expands far fewer cells.
+#  It stays admissible as long as the live grid blocks at least the cells of
+#  the static layout, except the start and goal of a query.
+#
+class LandmarkHeuristic:
+    UNREACHABLE = 0xFFFFFFFF
+    MAGIC = b'AWLM'
+    VERSION = 1
+
+    def __init__(self, warehouse_length, warehouse_width, blocked, landmarks, distances):
+        self.length = warehouse_length
+        self.width = warehouse_width
+        self.blocked = blocked
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @staticmethod
+    def fingerprint(blocked):
+        """A short digest identifying a static layout."""
+        return hashlib.sha1(bytes(blocked)).digest()
+
+    @classmethod
+    def build(cls, warehouse_length, warehouse_width, blocked, count=8, anchors=()):
+        """
+        Precompute landmark distances for a static layout.
+
+        Args:
+            blocked (bytearray): One byte per cell, non-zero for static obstacles.
+            count (int): The number of landmarks to place.
+            anchors (iterable): Positions (e.g. docks or destinations) that are
+                always used as landmarks, before the automatically placed ones.
+        """
+        blocked = bytearray(1 if cell else 0 for cell in blocked)
+        heuristic = cls(warehouse_length, warehouse_width, blocked, [], [])
+        for x, y in anchors:
+            heuristic.add_landmark(x * warehouse_width + y)
+
+        # Place the remaining landmarks far from each other (farthest-point
+        # selection), which gives the best bounds for the least memory.
+        free_cells = [index for index, cell in enumerate(blocked) if not cell]
+        if not free_cells:
+            return heuristic
+        nearest = None  # distance from every cell to its closest landmark so far
+        while len(heuristic.landmarks) < count:
+            for distance in heuristic.distances[len(heuristic.landmarks) - 1 if nearest is not None else 0:]:
+                if nearest is None:
+                    nearest = array('I', distance)
+                else:
+                    for index in free_cells:
+                        if distance[index] < nearest[index]:
+                            nearest[index] = distance[index]
+            if nearest is None:
+                candidate = free_cells[0]
+            else:
+                candidate = max(free_cells, key=lambda index: nearest[index] if nearest[index] != cls.UNREACHABLE else -1)
+                if nearest[candidate] in (0, cls.UNREACHABLE):
+                    break
+            heuristic.add_landmark(candidate)
+        return heuristic
+
+    def add_landmark(self, landmark):
+        """Add a landmark and compute its distance table with a BFS."""
+        width, length, blocked = self.width, self.length, self.blocked
+        distance = array('I', [self.UNREACHABLE]) * (length * width)
+        distance[landmark] = 0
+        queue = deque([landmark])
+        while queue:
+            current = queue.popleft()
+            if blocked[current] and current != landmark:
+                continue  # storage slots can be reached but not walked through
+            x, y = divmod(current, width)
+            step = distance[current] + 1
+            for neighbor, inside in ((current - width, x > 0),
+                                     (current + width, x < length - 1),
+                                     (current - 1, y > 0),
+                                     (current + 1, y < width - 1)):
+                if inside and distance[neighbor] == self.UNREACHABLE:
+                    distance[neighbor] = step
+                    queue.append(neighbor)
+        self.landmarks.append(landmark)
+        self.distances.append(distance)
+
+    def estimator(self, goal_index, through=()):
+        """
+        Return a function giving a lower bound on the distance from a cell to goal.
+
+        Args:
+            goal_index (int): The goal cell id.
+            through (iterable): Other cell ids the query may walk through. If any
+                of them is a static obstacle the bounds may overestimate, so
+                None is returned and the planner uses the Manhattan distance.
+
+        Returns:
+            callable or None
+        """
+        blocked = self.blocked
+        if any(blocked[index] for index in through) or not self.distances:
+            return None
+
+        unreachable = self.UNREACHABLE
+        if goal_index in self.landmarks and not blocked[goal_index]:
+            # A dock or destination used as a landmark: the table holds the
+            # exact distance (cells it marks unreachable cannot reach the goal).
+            return self.distances[self.landmarks.index(goal_index)].__getitem__
+        if not blocked[goal_index]:
+            targets = [goal_index]
+            offset = 0
+        else:
+            # A storage slot is only entered from one of its free neighbours,
+            # so bound the distance to the nearest of those and add one step.
+            x, y = divmod(goal_index, self.width)
+            targets = [n for n, inside in ((goal_index - self.width, x > 0),
+                                           (goal_index + self.width, x < self.length - 1),
+                                           (goal_index - 1, y > 0),
+                                           (goal_index + 1, y < self.width - 1))
+                       if inside and not blocked[n]]
+            offset = 1
+            if not targets:
+                return None
+
+        tables = [[(distance, distance[target]) for distance in self.distances if distance[target] != unreachable]
+                  for target in targets]
+
+        def estimate(index):
+            best = None
+            for table in tables:
+                bound = 0
+                for distance, to_target in table:
+                    here = distance[index]
+                    if here != unreachable:
+                        gap = here - to_target if here > to_target else to_target - here
+                        if gap > bound:
+                            bound = gap
+                if best is None or bound < best:
+                    best = bound
+            return best + offset
+
+        return estimate
+
+    def matches(self, warehouse_length, warehouse_width, blocked):
+        """Check whether this heuristic was built for the given static layout."""
+        return (self.length == warehouse_length and self.width == warehouse_width
+                and self.fingerprint(self.blocked) == self.fingerprint(bytearray(1 if cell else 0 for cell in blocked)))
+
+    def save(self, filename):
+        """Write the heuristic to a binary file that load() can read back."""
+        with open(filename, 'wb') as file:
+            file.write(struct.pack('<4sHIII', self.MAGIC, self.VERSION, self.length, self.width, len(self.landmarks)))
+            file.write(self.fingerprint(self.blocked))
+            file.write(self.blocked)
+            array('I', self.landmarks).tofile(file)
+            for distance in self.distances:
+                distance.tofile(file)
+
+    @classmethod
+    def load(cls, filename):
+        """Read a heuristic written by save()."""
+        header = struct.Struct('<4sHIII')
+        with open(filename, 'rb') as file:
+            data = file.read(header.size)
+            if len(data) != header.size:
+                raise ValueError("Not a landmark heuristic file.")
+            magic, version, length, width, count = header.unpack(data)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError("Not a landmark heuristic file.")
+            digest = file.read(20)
+            blocked = bytearray(file.read(length * width))
+            if cls.fingerprint(blocked) != digest:
+                raise ValueError("Landmark heuristic file is corrupted.")
+            landmarks = array('I')
+            landmarks.fromfile(file, count)
+            distances = []
+            for _ in range(count):
+                distance = array('I')
+                distance.fromfile(file, length * width)
+                distances.append(distance)
+        return cls(length, width, blocked, list(landmarks), distances)
+
+################################## GLOBAL STATE ###################################
+
+PLANNER_STATS = PlannerStats()  # shared by every planner of the process
+METRICS.add_collector(PLANNER_STATS)
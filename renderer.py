@@ -0,0 +1,369 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         renderer.py                                                      #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Draw the warehouse on the GUI canvas.                            #
+#  Description:  The Renderer shows a pannable and zoomable view of the floor and #
+#                only draws what is inside it. Zoomed in, it keeps one rectangle  #
+#                (and label) per visible robot and item slot and only moves,      #
+#                relabels, creates or deletes the shapes of the cells changed     #
+#                since the last frame, as told by the warehouse events. Zoomed    #
+#                out, the items become a heatmap of stock density per tile, one   #
+#                image whose size does not depend on the size of the floor.       #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+import math
+import time
+import tkinter as tk
+from metrics import METRICS
+
+################################### CONSTANTS #####################################
+
+FRAME_INTERVAL = 33     # ms between two frames (about 30 frames per second)
+DETAIL_ZOOM = 8         # pixels per cell from which items are drawn one by one
+LABEL_ZOOM = 24         # pixels per cell from which robots and items get labels
+MAX_ZOOM = 96           # pixels per cell when zoomed in the most
+ROBOT_SIZE = 4          # smallest size in pixels of a robot when zoomed out
+HEATMAP_TILES = 256     # the heatmap has at most this many tiles along each side
+HEATMAP_FRAMES = 15     # frames between heatmap updates while only the stock changes
+ROBOT_COLORS = {'standard': 'blue', 'large': 'green'}  # any other type is drawn red
+# Heatmap colours from an empty tile (white) to a full one (orange)
+HEATMAP_COLORS = ['#%02x%02x%02x' % (255, 255 - (255 - 140) * level // 16, 255 - 255 * level // 16)
+                  for level in range(17)]
+
+############################### CLASS DEFINITIONS #################################
+
+#===============================================================
+#  Class:       Renderer
+#  Attributes:
+#               canvas        : The Tkinter canvas drawn on
+#               warehouse     : The warehouse being drawn
+#               view_width, view_height : The size of the view in pixels
+#               zoom          : Pixels per cell
+#               left, top     : The cell coordinates at the top left corner of the view
+#               dirty         : The positions changed since the last frame
+#               full          : Whether the view must be drawn again (after a pan,
+#                               zoom or resize, or on the first frame)
+#               layout        : The (length, width) the tiles were counted for
+#               tile          : The side of a heatmap tile in cells
+#               tiles_down    : The number of tiles along the y axis
+#               tile_counts   : Per tile (x // tile * tiles_down + y // tile), the
+#                               number of cells holding an item
+#               item_cells    : The positions holding an item, as last seen
+#               robot_shapes  : Robot -> (rectangle id, label id or None) of the
+#                               visible robots
+#               item_shapes   : Position -> (rectangle id, label id or None, label
+#                               text) of the visible item slots, when zoomed in
+#               heatmap_image : The image shown as the heatmap, or None
+#               heatmap_stale : Frames since the tile counts changed, or None if the
+#                               heatmap is up to date
+#
+#  Cell (x, y) is drawn with its top left corner at pixel
+#  ((x - left) * zoom, (y - top) * zoom). Below DETAIL_ZOOM, zoom is kept at a
+#  whole number of pixels per tile, so the heatmap lines up with the robots.
+#
+#  The event listener only notes positions; it runs on whatever thread changes
+#  the warehouse, always under warehouse.lock. render(), pan() and zoom_at()
+#  run on the Tk main loop; render() copies what it needs under the same lock
+#  and draws after releasing it.
+#
+class Renderer:
+    def __init__(self, canvas, warehouse):
+        self.canvas = canvas
+        self.warehouse = warehouse
+        self.view_width = int(canvas.cget('width'))
+        self.view_height = int(canvas.cget('height'))
+        self.zoom = 1
+        self.left = 0
+        self.top = 0
+        self.dirty = set()
+        self.full = True
+        self.layout = None
+        self.tile = 1
+        self.tiles_down = 0
+        self.tile_counts = []
+        self.item_cells = set()
+        self.robot_shapes = {}
+        self.item_shapes = {}
+        self.heatmap_image = None
+        self.heatmap_stale = None
+        warehouse.add_listener(self.event)
+
+    def event(self, event):
+        # Note the position a warehouse event changed
+        kind = event[0]
+        if kind in ('step', 'robot', 'item'):
+            self.dirty.add((event[3], event[4]))
+        elif kind == 'quantity':
+            self.dirty.add((event[1], event[2]))
+        elif kind == 'resize':
+            self.full = True
+
+    def invalidate(self):
+        # Draw everything again on the next frame
+        self.full = True
+
+    def fit(self):
+        # Zoom out to show the whole floor
+        length, width = self.layout
+        self.zoom = min(self.view_width / length, self.view_height / width, MAX_ZOOM)
+        if self.zoom < DETAIL_ZOOM:
+            self.zoom = max(1, math.floor(self.zoom * self.tile)) / self.tile
+        self.left = self.top = 0
+        self.full = True
+
+    def pan(self, dx, dy):
+        """
+        Move the view with the pointer.
+
+        Args:
+            dx (int): Pixels the floor moves to the right.
+            dy (int): Pixels the floor moves down.
+
+        Returns:
+            None
+        """
+        self.left -= dx / self.zoom
+        self.top -= dy / self.zoom
+        self.full = True
+
+    def zoom_at(self, factor, px, py):
+        """
+        Zoom in (factor > 1) or out around a point of the view, which stays
+        over the same cell.
+
+        Args:
+            factor (float): The change of scale.
+            px (int): The x pixel coordinate of the point.
+            py (int): The y pixel coordinate of the point.
+
+        Returns:
+            None
+        """
+        zoom = self.zoom * factor
+        if zoom < DETAIL_ZOOM:
+            # A whole number of pixels per tile, at least one step away from now.
+            step = round(self.zoom * self.tile)
+            pixels = round(zoom * self.tile)
+            if pixels == step:
+                pixels += 1 if factor > 1 else -1
+            zoom = max(1, pixels) / self.tile
+        zoom = min(zoom, MAX_ZOOM)
+        x = self.left + px / self.zoom
+        y = self.top + py / self.zoom
+        self.zoom = zoom
+        self.left = x - px / zoom
+        self.top = y - py / zoom
+        self.full = True
+
+    def cell_at(self, px, py):
+        """
+        Find the cell under a point of the view.
+
+        Args:
+            px (int): The x pixel coordinate.
+            py (int): The y pixel coordinate.
+
+        Returns:
+            tuple: The (x, y) cell coordinates (possibly outside the floor).
+        """
+        return math.floor(self.left + px / self.zoom), math.floor(self.top + py / self.zoom)
+
+    def visible_cells(self):
+        # The cells in view, as (x0, y0, x1, y1) with x0 <= x < x1 and y0 <= y < y1
+        length, width = self.layout
+        return (max(0, math.floor(self.left)), max(0, math.floor(self.top)),
+                min(length, math.ceil(self.left + self.view_width / self.zoom)),
+                min(width, math.ceil(self.top + self.view_height / self.zoom)))
+
+    def count_tiles(self):
+        # Count the item cells of every heatmap tile from scratch
+        length, width = self.layout
+        self.tile = max(1, math.ceil(max(length, width) / HEATMAP_TILES))
+        self.tiles_down = math.ceil(width / self.tile)
+        self.tile_counts = [0] * (math.ceil(length / self.tile) * self.tiles_down)
+        self.item_cells = set(self.warehouse.item_index)
+        for x, y in self.item_cells:
+            self.tile_counts[x // self.tile * self.tiles_down + y // self.tile] += 1
+
+    def render(self):
+        """
+        Bring the view up to date with the warehouse. Must run on the Tk main loop.
+        The time of every frame that draws something goes to METRICS.
+
+        Returns:
+            None
+        """
+        started = time.perf_counter()
+        if self.draw():
+            METRICS.observe('render_frame_seconds', time.perf_counter() - started)
+
+    def draw(self):
+        # The work of render(); returns whether anything was drawn
+        warehouse = self.warehouse
+        with warehouse.lock:
+            full, self.full = self.full, False
+            dirty, self.dirty = self.dirty, set()
+            size = (warehouse.length, warehouse.width)
+            if size != self.layout:
+                self.layout = size
+                self.count_tiles()
+                self.fit()
+                full = True
+            else:
+                for position in dirty:
+                    present = position in warehouse.item_index
+                    if present != (position in self.item_cells):
+                        if present:
+                            self.item_cells.add(position)
+                        else:
+                            self.item_cells.discard(position)
+                        x, y = position
+                        self.tile_counts[x // self.tile * self.tiles_down + y // self.tile] += 1 if present else -1
+                        if self.heatmap_stale is None:
+                            self.heatmap_stale = 0
+            detail = self.zoom >= DETAIL_ZOOM
+            x0, y0, x1, y1 = self.visible_cells()
+            if full:
+                robots = [(robot, robot.position) for robot in warehouse.robots]
+                positions = ((x, y) for x in range(x0, x1) for y in range(y0, y1)) if detail else ()
+            else:
+                robots = [(warehouse.robot_index[position], position)
+                          for position in dirty if position in warehouse.robot_index]
+                positions = dirty if detail else ()
+            items = {}
+            for position in positions:
+                x, y = position
+                if x0 <= x < x1 and y0 <= y < y1:
+                    item = warehouse.item_index.get(position)
+                    if item is not None or position in self.item_shapes:
+                        items[position] = self.label(item) if item is not None else None
+
+        canvas = self.canvas
+        drew = full
+        if full:
+            canvas.delete('robot', 'item', 'grid', 'heatmap')
+            self.robot_shapes.clear()
+            self.item_shapes.clear()
+            self.draw_grid(detail)
+            if not detail:
+                self.draw_heatmap()
+        elif not detail and self.heatmap_stale is not None:
+            self.heatmap_stale += 1
+            if self.heatmap_stale >= HEATMAP_FRAMES:
+                canvas.delete('heatmap')
+                self.draw_heatmap()
+                drew = True
+        if not (robots or items):
+            return drew
+
+        zoom, left, top = self.zoom, self.left, self.top
+        labels = zoom >= LABEL_ZOOM
+        created = False
+        for position, label in items.items():
+            shape = self.item_shapes.get(position)
+            if label is None:
+                if shape is not None:
+                    canvas.delete(*[shape_id for shape_id in shape[:2] if shape_id is not None])
+                    del self.item_shapes[position]
+            elif shape is None:
+                x, y = position
+                rectangle = canvas.create_rectangle((x - left) * zoom, (y - top) * zoom, (x + 1 - left) * zoom,
+                                                    (y + 1 - top) * zoom, fill='orange', tags='item')
+                text = canvas.create_text((x + 0.5 - left) * zoom, (y + 0.5 - top) * zoom, text=label,
+                                          fill='white', tags='item') if labels else None
+                self.item_shapes[position] = (rectangle, text, label)
+                created = True
+            elif shape[2] != label:
+                if shape[1] is not None:
+                    canvas.itemconfigure(shape[1], text=label)
+                self.item_shapes[position] = (shape[0], shape[1], label)
+
+        half = max(zoom, ROBOT_SIZE) / 2
+        for robot, (x, y) in robots:
+            shape = self.robot_shapes.get(robot)
+            if not (x0 <= x < x1 and y0 <= y < y1):
+                if shape is not None:
+                    canvas.delete(*[shape_id for shape_id in shape if shape_id is not None])
+                    del self.robot_shapes[robot]
+                continue
+            cx, cy = (x + 0.5 - left) * zoom, (y + 0.5 - top) * zoom
+            if shape is None:
+                color = ROBOT_COLORS.get(robot.robot_type, 'red')
+                rectangle = canvas.create_rectangle(cx - half, cy - half, cx + half, cy + half,
+                                                    fill=color, tags='robot')
+                text = canvas.create_text(cx, cy, text=f'{robot.robot_type[0].upper()}{robot.robot_id}',
+                                          fill='white', tags='robot') if labels else None
+                self.robot_shapes[robot] = (rectangle, text)
+                created = True
+            else:
+                canvas.coords(shape[0], cx - half, cy - half, cx + half, cy + half)
+                if shape[1] is not None:
+                    canvas.coords(shape[1], cx, cy)
+        if created:
+            canvas.tag_raise('robot')  # robots stay visible on the slot they pick from
+        return True
+
+    def draw_grid(self, detail):
+        # Draw the outline of the floor, and the lines between the visible cells when zoomed in
+        canvas = self.canvas
+        length, width = self.layout
+        zoom, left, top = self.zoom, self.left, self.top
+        canvas.create_rectangle(-left * zoom, -top * zoom, (length - left) * zoom, (width - top) * zoom,
+                                outline='gray', tags='grid')
+        if detail:
+            x0, y0, x1, y1 = self.visible_cells()
+            for x in range(x0 + 1, x1):
+                canvas.create_line((x - left) * zoom, (y0 - top) * zoom, (x - left) * zoom, (y1 - top) * zoom,
+                                   fill='gray', tags='grid')
+            for y in range(y0 + 1, y1):
+                canvas.create_line((x0 - left) * zoom, (y - top) * zoom, (x1 - left) * zoom, (y - top) * zoom,
+                                   fill='gray', tags='grid')
+        canvas.tag_lower('grid')
+
+    def heatmap_rows(self):
+        """
+        Colour the visible heatmap tiles by the share of their cells holding an item.
+
+        Returns:
+            tuple: (tx0, ty0, rows) where rows holds one list of colours per row
+                of tiles, starting with tile (tx0, ty0).
+        """
+        tile = self.tile
+        length, width = self.layout
+        x0, y0, x1, y1 = self.visible_cells()
+        tx0, ty0 = x0 // tile, y0 // tile
+        tx1, ty1 = math.ceil(x1 / tile), math.ceil(y1 / tile)
+        counts, down = self.tile_counts, self.tiles_down
+        across = [min(tile, length - tx * tile) for tx in range(tx0, tx1)]
+        rows = []
+        for ty in range(ty0, ty1):
+            cells_down = min(tile, width - ty * tile)
+            rows.append([HEATMAP_COLORS[math.ceil(16 * counts[tx * down + ty] / (cells * cells_down))]
+                         for tx, cells in zip(range(tx0, tx1), across)])
+        return tx0, ty0, rows
+
+    def draw_heatmap(self):
+        # Draw the stock density of the visible tiles as one image
+        self.heatmap_stale = None
+        tx0, ty0, rows = self.heatmap_rows()
+        if not rows or not rows[0]:
+            self.heatmap_image = None
+            return
+        image = tk.PhotoImage(master=self.canvas, width=len(rows[0]), height=len(rows))
+        image.put(' '.join('{' + ' '.join(row) + '}' for row in rows))
+        scale = round(self.zoom * self.tile)
+        if scale > 1:
+            image = image.zoom(scale)
+        self.heatmap_image = image  # the canvas does not keep a reference
+        self.canvas.create_image((tx0 * self.tile - self.left) * self.zoom, (ty0 * self.tile - self.top) * self.zoom,
+                                 image=image, anchor='nw', tags='heatmap')
+        self.canvas.tag_lower('heatmap')
+
+    @staticmethod
+    def label(item):
+        # The text drawn on an item slot
+        return f'{item.item_name}\n{item.weight}kg'
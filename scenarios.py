@@ -0,0 +1,217 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         scenarios.py                                                     #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Generate reproducible warehouses to test and benchmark with.     #
+#  Description:  A Scenario describes a square floor with a storage layout        #
+#                ('random' slots, single-deep 'aisles' of racking or double-deep  #
+#                'dense' storage), a fleet mix of standard, large and mini        #
+#                robots, and a stream of orders arriving over time. Everything    #
+#                is drawn from random generators seeded by the scenario, so the   #
+#                same scenario always builds the same warehouse and orders. The   #
+#                docks are on the top wall (row x = 0), one per item name. Used   #
+#                by benchmark.py --suite.                                         #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+import random
+from itemrobot import Item, ROBOT_CLASSES
+from warehouse import Warehouse
+
+################################### CONSTANTS #####################################
+
+LAYOUTS = ('random', 'aisles', 'dense')
+
+# Fleet mix -> robot type -> share of the fleet (see itemrobot.ROBOT_CLASSES)
+FLEET_MIXES = {
+    'standard': {'standard': 1},
+    'mixed': {'standard': 2, 'large': 1, 'mini': 1},
+    'light': {'standard': 1, 'mini': 3},
+}
+
+RANDOM_DENSITY = 0.2              # share of the cells holding a slot in the random layout
+UNIT_WEIGHTS = (0.5, 1, 2, 3)     # kg, one per item name
+SLOT_QUANTITY = (10, 50)          # range of the quantity stored in a slot
+ORDER_QUANTITY = (1, 5)           # range of the quantity of an order
+RUSH_SHARE = 0.1                  # share of the orders with priority 1
+
+############################### CLASS DEFINITIONS #################################
+
+#===============================================================
+#  Class:       Scenario
+#  Attributes:
+#               layout   : One of LAYOUTS
+#               size     : The side length of the square floor
+#               robots   : The number of robots
+#               orders   : The number of orders in the stream
+#               mix      : The fleet mix, a key of FLEET_MIXES
+#               skus     : The number of item names (and docks)
+#               duration : The simulated seconds a run may take; the orders arrive
+#                          during the first half
+#               seed     : The seed of every random choice
+#
+class Scenario:
+    def __init__(self, layout, size, robots, orders, mix='mixed', skus=None, duration=None, seed=0):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout: {layout}.")
+        if mix not in FLEET_MIXES:
+            raise ValueError(f"Unknown fleet mix: {mix}.")
+        if size < 10:
+            raise ValueError("Scenarios need a floor of at least 10x10.")
+        self.layout = layout
+        self.size = size
+        self.robots = robots
+        self.orders = orders
+        self.mix = mix
+        self.skus = skus if skus is not None else min(size // 4, 25)
+        self.duration = duration if duration is not None else max(300, 4 * size)
+        self.seed = seed
+
+    @property
+    def name(self):
+        # A short name telling the scenarios of a suite apart
+        return f"{self.layout}-{self.size}-{self.mix}"
+
+    def describe(self):
+        # The parameters of the scenario as a dict
+        return {'layout': self.layout, 'size': self.size, 'robots': self.robots, 'orders': self.orders,
+                'mix': self.mix, 'skus': self.skus, 'duration': self.duration, 'seed': self.seed}
+
+    def random(self, purpose):
+        # A generator of its own for each purpose, so that e.g. more robots
+        # do not change the layout or the orders
+        return random.Random(f"{self.seed}:{purpose}")
+
+    def slot_positions(self):
+        """
+        Lay out the storage slots. Rows 0 and 1 (docks) and the cross aisles at
+        both ends of the racks stay free.
+
+        Returns:
+            list: The positions of the slots.
+        """
+        size = self.size
+        if self.layout == 'random':
+            rng = self.random('layout')
+            cells = range(2 * size, size * size)
+            return [divmod(cell, size) for cell in sorted(rng.sample(cells, int(len(cells) * RANDOM_DENSITY)))]
+        if self.layout == 'aisles':
+            racks = range(2, size - 2, 3)                                # one rack, two aisle cells
+        else:
+            racks = [x for x in range(2, size - 2) if (x - 2) % 3 != 2]  # two racks, one aisle cell
+        return [(x, y) for x in racks for y in range(3, size - 3)]
+
+    def docks(self):
+        # The drop-off cell of every item name, spread over the top wall
+        return [(0, (index * self.size + self.size // 2) // self.skus) for index in range(self.skus)]
+
+    def items(self):
+        """
+        Stock every slot with one of the item names.
+
+        Returns:
+            list: The Item objects (sku1, sku2, ...; the same unit weight and
+                item ID for every slot of a name).
+        """
+        rng = self.random('items')
+        weights = [rng.choice(UNIT_WEIGHTS) for _ in range(self.skus)]
+        items = []
+        for position in self.slot_positions():
+            sku = rng.randrange(self.skus)
+            items.append(Item(f"sku{sku + 1}", sku + 1, position, weights[sku], rng.randint(*SLOT_QUANTITY)))
+        return items
+
+    def fleet(self, taken):
+        """
+        Create the robots on random free cells.
+
+        Args:
+            taken (bytearray): One byte per cell (x * size + y), 1 where the
+                robots must not stand.
+
+        Returns:
+            list: The robots, their types following the fleet mix in turn.
+        """
+        rng = self.random('fleet')
+        size = self.size
+        if self.robots > taken.count(0):
+            raise ValueError(f"No room for {self.robots} robots on scenario {self.name}.")
+        types = [robot_type for robot_type, share in FLEET_MIXES[self.mix].items() for _ in range(share)]
+        counts = {}
+        robots = []
+        while len(robots) < self.robots:
+            cell = rng.randrange(size * size)
+            if taken[cell]:
+                continue
+            taken[cell] = 1
+            robot_type = types[len(robots) % len(types)]
+            counts[robot_type] = counts.get(robot_type, 0) + 1
+            robots.append(ROBOT_CLASSES[robot_type](counts[robot_type], divmod(cell, size)))
+        return robots
+
+    def order_stream(self):
+        """
+        Draw the orders and their arrival times. Popular item names are
+        ordered more often (the k-th name with weight 1/k), and the arrivals
+        form a Poisson stream over the first half of the duration.
+
+        Returns:
+            list: (arrival, item_name, quantity, destination, priority) tuples,
+                by arrival time in simulated seconds.
+        """
+        rng = self.random('orders')
+        docks = self.docks()
+        popularity = [1 / rank for rank in range(1, self.skus + 1)]
+        rate = self.orders / (self.duration / 2)
+        arrival = 0
+        stream = []
+        for _ in range(self.orders):
+            arrival += rng.expovariate(rate)
+            sku = rng.choices(range(self.skus), popularity)[0]
+            priority = 1 if rng.random() < RUSH_SHARE else 0
+            stream.append((arrival, f"sku{sku + 1}", rng.randint(*ORDER_QUANTITY), docks[sku], priority))
+        return stream
+
+    def build(self, **options):
+        """
+        Create the warehouse with its items and robots.
+
+        Args:
+            **options: Passed on to Warehouse (e.g. path_algorithm='jps',
+                fleet_store=True).
+
+        Returns:
+            Warehouse: The warehouse, without a simulation attached yet.
+        """
+        size = self.size
+        warehouse = Warehouse(size, size, **options)
+        items = self.items()
+        taken = bytearray(size * size)
+        for x, y in self.docks():
+            taken[x * size + y] = 1
+        for item in items:
+            x, y = item.position
+            taken[x * size + y] = 1
+        warehouse.store_items(items)
+        warehouse.store_robots(self.fleet(taken))
+        return warehouse
+
+    def feed(self, warehouse, stream=None):
+        """
+        Submit the orders of the stream when their time comes. Simulation process.
+
+        Args:
+            warehouse (Warehouse): The warehouse built by build().
+            stream (list, optional): The orders. Defaults to order_stream().
+
+        Returns:
+            list: The order IDs.
+        """
+        order_ids = []
+        for arrival, item_name, quantity, destination, priority in stream or self.order_stream():
+            while warehouse.clock.now < arrival:
+                yield None
+            order_ids.append(warehouse.submit_order(item_name, quantity, destination, priority))
+        return order_ids
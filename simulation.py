@@ -0,0 +1,312 @@
+###################################################################################
+#  Project:      Automated Warehouse Management System                            #
+#  File:         simulation.py                                                    #
+#  Team members: Kushal Sedhai     Haoyuan Jiang     Zhaolin Wei                  #
+#  Student ID:   60286127          14636898          89282347                     #
+#  Purpose:      Run warehouse tasks on a virtual clock, with or without a GUI.   #
+#  Description:  Tasks such as Warehouse.assign_task and Robot.perform_task are   #
+#                written as generators ("processes"). A process may yield:        #
+#                  (robot, position) - step the robot to position (or wait in     #
+#                                      place if position is None); resumed with   #
+#                                      True if the step was granted               #
+#                  [generators]      - run these processes concurrently and       #
+#                                      resume with the list of their results      #
+#                  None              - resume on the next tick                    #
+#                The Simulation class is the central scheduler: on every tick of  #
+#                a discrete virtual clock it collects the steps of all robots     #
+#                that are due, resolves which cells they may claim, and moves     #
+#                them together. Nothing here depends on Tk: the GUI is just an    #
+#                observer and can be left out to run a whole shift in seconds.    #
+###################################################################################
+
+#################################### IMPORTS ######################################
+
+import threading
+import time
+from metrics import METRICS
+
+############################### CLASS DEFINITIONS #################################
+
+#===============================================================
+#  Class:       VirtualClock
+#  Attributes:
+#               ticks_per_second : The number of ticks in one simulated second
+#               tick             : The number of ticks elapsed so far
+#
+class VirtualClock:
+    def __init__(self, ticks_per_second=10):
+        self.ticks_per_second = ticks_per_second
+        self.tick = 0
+
+    @property
+    def now(self):
+        # Simulated time in seconds
+        return self.tick / self.ticks_per_second
+
+    def advance(self, ticks=1):
+        # Move the clock forward
+        self.tick += ticks
+
+    def ticks_for(self, speed):
+        # Number of ticks a robot with the given speed (grid/s) needs per cell
+        return max(1, round(self.ticks_per_second / speed))
+
+#===============================================================
+#  Class:       Process
+#  Attributes:
+#               generator : The generator running the task
+#               due       : The tick at which the process is resumed next (None
+#                           while it waits for its children)
+#               result    : The value sent into the generator when it is resumed
+#               parent    : The process waiting for this one, if any
+#               children  : The number of unfinished child processes
+#               results   : The return values of the child processes
+#               index     : The position of this process among its siblings
+#
+class Process:
+    def __init__(self, generator, due, parent=None, index=0):
+        self.generator = generator
+        self.due = due
+        self.result = None
+        self.parent = parent
+        self.children = 0
+        self.results = []
+        self.index = index
+
+#===============================================================
+#  Class:       Simulation
+#  Attributes:
+#               warehouse : The warehouse being simulated
+#               clock     : The virtual clock
+#               processes : The processes that have not finished yet
+#               observers : Callables invoked as observer(simulation) after every
+#                           tick in which something happened (e.g. a GUI redraw)
+#               running   : Whether run() is currently driving the simulation
+#               lock      : Guards processes and running against other threads
+#
+#  Each tick runs under warehouse.lock, so other threads (such as the GUI
+#  placing items) never see the warehouse half-way through a tick.
+#
+class Simulation:
+    def __init__(self, warehouse, ticks_per_second=10):
+        self.warehouse = warehouse
+        self.clock = VirtualClock(ticks_per_second)
+        warehouse.clock = self.clock
+        warehouse.simulation = self
+        self.processes = []
+        self.observers = []
+        self.running = False
+        self.lock = threading.Lock()
+        warehouse.start_dispatcher()  # for orders submitted before the simulation existed
+
+    def spawn(self, generator):
+        """
+        Start a process on the next tick.
+
+        Args:
+            generator (generator): A process such as Warehouse.assign_task(...).
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.processes.append(Process(generator, self.clock.tick))
+
+    def add_observer(self, observer):
+        """
+        Register a callable to be notified after each active tick.
+
+        Args:
+            observer (callable): Called as observer(simulation).
+
+        Returns:
+            None
+        """
+        self.observers.append(observer)
+
+    def busy(self):
+        """
+        Check whether any process is still running.
+
+        Returns:
+            bool: True if there is at least one unfinished process.
+        """
+        with self.lock:
+            return bool(self.processes)
+
+    def step(self):
+        """
+        Advance the simulation by one tick. Every due process is resumed, the
+        steps requested by all robots are resolved together, and the granted
+        ones are applied at once.
+
+        Returns:
+            None
+        """
+        now = self.clock.tick
+        with self.warehouse.lock:
+            with self.lock:
+                due = [process for process in self.processes if process.due is not None and process.due <= now]
+
+            moves = []
+            for process in due:
+                request = self.resume(process, now)
+                if isinstance(request, tuple):
+                    moves.append((process, request[0], request[1]))
+
+            granted = self.resolve_claims([(robot, position) for _, robot, position in moves if position is not None])
+            for process, robot, position in moves:
+                if position is None:
+                    process.result = True
+                elif robot in granted:
+                    self.warehouse.move_robot(robot, position)
+                    process.result = True
+                else:
+                    process.result = False
+                process.due = now + self.clock.ticks_for(robot.speed)
+
+            robots = len(self.warehouse.robots)
+            if robots:
+                idle = self.warehouse.idle_count()
+                tick = 1 / self.clock.ticks_per_second
+                METRICS.increment('robot_idle_seconds_total', idle * tick)
+                METRICS.increment('robot_busy_seconds_total', (robots - idle) * tick)
+                METRICS.set_gauge('robot_utilisation', (robots - idle) / robots)
+
+        self.clock.advance()
+        if due:
+            for observer in self.observers:
+                observer(self)
+
+    def resume(self, process, now):
+        """
+        Resume one process and handle any request other than a robot step.
+
+        Returns:
+            The request yielded by the process, or None if it finished or forked.
+        """
+        try:
+            request = process.generator.send(process.result)
+        except StopIteration as stop:
+            self.finish(process, stop.value, now)
+            return None
+        if isinstance(request, list):
+            process.due = None
+            process.children = len(request)
+            process.results = [None] * len(request)
+            with self.lock:
+                for index, generator in enumerate(request):
+                    self.processes.append(Process(generator, now + 1, process, index))
+            if not request:
+                process.result, process.due = [], now + 1
+            return None
+        if request is None:
+            process.result = None
+            process.due = now + 1
+        return request
+
+    def finish(self, process, value, now):
+        # Remove a finished process and wake its parent once all siblings are done.
+        with self.lock:
+            self.processes.remove(process)
+        parent = process.parent
+        if parent is not None:
+            parent.results[process.index] = value
+            parent.children -= 1
+            if parent.children == 0:
+                parent.result = parent.results
+                parent.due = now + 1
+
+    def resolve_claims(self, requests):
+        """
+        Decide which of this tick's robot steps may go ahead.
+
+        A robot may step into a cell unless another robot claimed the same cell
+        earlier in this tick, or a robot is standing there and is not itself
+        granted a step away (two robots swapping cells is refused too).
+        Requests are considered in order, so earlier processes win ties.
+
+        Args:
+            requests (list): (robot, position) pairs.
+
+        Returns:
+            set: The robots whose step was granted.
+        """
+        standing = self.warehouse.robot_index
+        target = {robot: position for robot, position in requests}
+        granted = set()
+        refused = set()
+        claimed = set()
+        undecided = list(requests)
+        while undecided:
+            waiting = []
+            for robot, position in undecided:
+                occupant = standing.get(position)
+                if position in claimed:
+                    refused.add(robot)
+                elif occupant is None or occupant is robot:
+                    granted.add(robot)
+                    claimed.add(position)
+                elif occupant in refused or occupant not in target or target[occupant] == robot.position:
+                    refused.add(robot)
+                elif occupant in granted:
+                    granted.add(robot)
+                    claimed.add(position)
+                else:
+                    waiting.append((robot, position))
+            if len(waiting) == len(undecided):
+                # A cycle of robots each waiting for the next one to move; refuse
+                # them all rather than rotate through each other.
+                refused.update(robot for robot, _ in waiting)
+                break
+            undecided = waiting
+        return granted
+
+    def run(self, until=None, realtime=False):
+        """
+        Run until every process has finished.
+
+        Args:
+            until (float, optional): Stop once this many simulated seconds have passed.
+            realtime (bool, optional): Pace the ticks to wall-clock time (for the GUI).
+                Defaults to False, which runs as fast as possible.
+
+        Returns:
+            float: The simulated time in seconds when the run stopped.
+        """
+        with self.lock:
+            self.running = True
+        tick_length = 1 / self.clock.ticks_per_second
+        next_tick = time.monotonic()
+        try:
+            while until is None or self.clock.now < until:
+                with self.lock:
+                    if not self.processes:
+                        self.running = False
+                        break
+                self.step()
+                if realtime:
+                    next_tick += tick_length
+                    delay = next_tick - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+        finally:
+            with self.lock:
+                self.running = False
+        return self.clock.now
+
+    def run_in_background(self, realtime=True):
+        """
+        Run the simulation on a worker thread unless one is already running.
+
+        Args:
+            realtime (bool, optional): Pace the ticks to wall-clock time. Defaults to True.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+        threading.Thread(target=self.run, kwargs={'realtime': realtime}, daemon=True).start()